@@ -1,13 +1,18 @@
+import logging
+import os
 from flask import Flask
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from .logging_utils import configure_logging, log_requests
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
 
 def create_app():
+    configure_logging()
     app = Flask(__name__)
     CORS(app)
+    log_requests(app)
     
     # Configure SQLAlchemy
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///life_os.db'
@@ -20,9 +25,39 @@ def create_app():
     from .routes import main_bp
     from .clickup_integration import clickup_bp
     from .weather_integration import weather_bp
+    from .stream import stream_bp
+    from .images import images_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(clickup_bp)
     app.register_blueprint(weather_bp)
+    app.register_blueprint(stream_bp)
+    app.register_blueprint(images_bp)
+
+    with app.app_context():
+        from . import models  # noqa: F401 - register tables before create_all
+        db.create_all()
+        from .migrations import run_migrations
+        run_migrations(db.engine)
+
+    from .analytics import reflections_cli
+    app.cli.add_command(reflections_cli)
+
+    # Google Calendar is optional
+    try:
+        from .calendar_integration import calendar_bp, calendar_cli
+        app.register_blueprint(calendar_bp)
+        app.cli.add_command(calendar_cli)
+    except ImportError:
+        logging.getLogger(__name__).warning("Calendar integration not available")
+
+    # Forecasts fetched by the scheduler reach the other workers through this file
+    from .weather_integration import forecast_cache
+    os.makedirs(app.instance_path, exist_ok=True)
+    forecast_cache.use_path(os.getenv('WEATHER_CACHE_PATH') or os.path.join(app.instance_path, 'weather_cache.json'))
+
+    # Refresh integrations in the background so requests read stored results
+    from .scheduler import start_scheduler
+    start_scheduler(app)
     
     return app 
\ No newline at end of file
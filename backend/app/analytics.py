@@ -0,0 +1,192 @@
+import logging
+from datetime import timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .models import db, Reflection, ReflectionDayStats, ReflectionWeekStats
+
+logger = logging.getLogger(__name__)
+
+# Free-text fields counted towards word totals
+TEXT_FIELDS = ('priorities', 'intention', 'reflection', 'challenges', 'tomorrow')
+
+COUNTERS = ('entries', 'morning', 'evening', 'words')
+
+# Days per IN (...) query when recomputing
+RECOMPUTE_CHUNK = 500
+
+day_stats = ReflectionDayStats.__table__
+week_stats = ReflectionWeekStats.__table__
+
+# Every function here takes ``conn``: db.session in request handlers, or a
+# plain Connection inside a migration. Callers own the transaction.
+
+
+def count_words(values):
+    return sum(len(value.split()) for value in values if value)
+
+
+def week_start(day):
+    """Monday of the week containing ``day``."""
+    return day - timedelta(days=day.weekday())
+
+
+def _counts(type_, words):
+    return {
+        'entries': 1,
+        'morning': int(type_ == 'morning'),
+        'evening': int(type_ == 'evening'),
+        'words': words
+    }
+
+
+def _refresh_streaks(conn, start, last_changed):
+    """Recompute streaks from ``start`` onwards, stopping once past ``last_changed`` with nothing to fix."""
+    streak = conn.execute(select(day_stats.c.streak).where(day_stats.c.day == start - timedelta(days=1))).scalar() or 0
+    previous = start - timedelta(days=1)
+    rows = conn.execute(
+        select(day_stats.c.day, day_stats.c.streak).where(day_stats.c.day >= start).order_by(day_stats.c.day)
+    ).all()
+    for row in rows:
+        streak = streak + 1 if row.day == previous + timedelta(days=1) else 1
+        if streak != row.streak:
+            conn.execute(update(day_stats).where(day_stats.c.day == row.day).values(streak=streak))
+        elif row.day > last_changed:
+            break
+        previous = row.day
+
+
+def record_reflection(conn, reflection):
+    """Add a newly written reflection to the day and week aggregates.
+
+    Call in the same transaction as the write. Writing today's entry costs a
+    few primary-key reads and writes; the streak walk only goes further when
+    a gap before later days is filled in.
+    """
+    counts = _counts(reflection.type, count_words(getattr(reflection, field) for field in TEXT_FIELDS))
+    # Upsert so two first writes of a day can't both insert; the row is new
+    # exactly when this entry is its only one
+    stmt = sqlite_insert(day_stats).values(day=reflection.day, streak=0, **counts)
+    entries = conn.execute(stmt.on_conflict_do_update(
+        index_elements=[day_stats.c.day],
+        set_={name: day_stats.c[name] + stmt.excluded[name] for name in counts}
+    ).returning(day_stats.c.entries)).scalar()
+    new_day = entries == 1
+
+    week_counts = dict(counts, days=int(new_day))
+    stmt = sqlite_insert(week_stats).values(week_start=week_start(reflection.day), **week_counts)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=[week_stats.c.week_start],
+        set_={name: week_stats.c[name] + stmt.excluded[name] for name in week_counts}
+    ))
+
+    if new_day:
+        _refresh_streaks(conn, reflection.day, reflection.day)
+
+
+def recompute_days(conn, days):
+    """Recompute the aggregates for ``days`` (and their weeks) from the reflection table.
+
+    Used after bulk writes; cost is proportional to the reflections on those
+    days, not to the whole history.
+    """
+    days = sorted({day for day in days if day is not None})
+    if not days:
+        return
+
+    totals = {}
+    columns = [Reflection.day, Reflection.type] + [getattr(Reflection, field) for field in TEXT_FIELDS]
+    for i in range(0, len(days), RECOMPUTE_CHUNK):
+        chunk = days[i:i + RECOMPUTE_CHUNK]
+        for row in conn.execute(select(*columns).where(Reflection.day.in_(chunk))):
+            counts = _counts(row.type, count_words(row[2:]))
+            day_totals = totals.setdefault(row.day, dict.fromkeys(COUNTERS, 0))
+            for name, value in counts.items():
+                day_totals[name] += value
+        conn.execute(delete(day_stats).where(day_stats.c.day.in_(chunk)))
+    if totals:
+        conn.execute(insert(day_stats), [dict(day=day, streak=0, **counts) for day, counts in totals.items()])
+
+    for start in sorted({week_start(day) for day in days}):
+        row = conn.execute(select(
+            *(func.coalesce(func.sum(day_stats.c[name]), 0).label(name) for name in COUNTERS),
+            func.count().label('days')
+        ).where(day_stats.c.day.between(start, start + timedelta(days=6)))).one()
+        conn.execute(delete(week_stats).where(week_stats.c.week_start == start))
+        if row.days:
+            conn.execute(insert(week_stats).values(week_start=start, **row._asdict()))
+
+    _refresh_streaks(conn, days[0], days[-1])
+
+
+def rebuild_stats(conn):
+    """Drop and recompute every aggregate from the reflection table."""
+    conn.execute(delete(day_stats))
+    conn.execute(delete(week_stats))
+    days = conn.execute(select(Reflection.day).where(Reflection.day.isnot(None)).distinct()).scalars().all()
+    recompute_days(conn, days)
+    logger.info("Rebuilt reflection statistics for %d days", len(days))
+    return len(days)
+
+
+def get_stats(conn, first_day, last_day):
+    """Streaks, completion rates and weekly totals for ``first_day``..``last_day`` inclusive.
+
+    Reads one aggregate row per day and per week in the range.
+    """
+    rows = conn.execute(
+        select(day_stats).where(day_stats.c.day.between(first_day - timedelta(days=1), last_day))
+        .order_by(day_stats.c.day)
+    ).all()
+    by_day = {row.day: row for row in rows}
+    in_range = [row for row in rows if row.day >= first_day]
+    weeks = conn.execute(
+        select(week_stats).where(week_stats.c.week_start.between(week_start(first_day), last_day))
+        .order_by(week_stats.c.week_start)
+    ).all()
+
+    total_days = (last_day - first_day).days + 1
+
+    def rate(count):
+        return round(count / total_days, 3)
+
+    # A streak is still current if the last entry was on last_day or the day before
+    current = by_day.get(last_day) or by_day.get(last_day - timedelta(days=1))
+    return {
+        'from': first_day.isoformat(),
+        'to': last_day.isoformat(),
+        'days': total_days,
+        'days_journaled': len(in_range),
+        'entries': sum(row.entries for row in in_range),
+        'words': sum(row.words for row in in_range),
+        'completion': {
+            'morning': rate(sum(1 for row in in_range if row.morning)),
+            'evening': rate(sum(1 for row in in_range if row.evening)),
+            'both': rate(sum(1 for row in in_range if row.morning and row.evening))
+        },
+        'streak': {
+            'current': current.streak if current else 0,
+            # Longest run ending inside the range (it may have started earlier)
+            'longest': max((row.streak for row in in_range), default=0)
+        },
+        'weeks': [{
+            'week_start': row.week_start.isoformat(),
+            'entries': row.entries,
+            'morning': row.morning,
+            'evening': row.evening,
+            'words': row.words,
+            'days': row.days
+        } for row in weeks]
+    }
+
+
+reflections_cli = AppGroup('reflections', help='Reflection maintenance commands.')
+
+
+@reflections_cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the per-day and per-week reflection statistics from scratch."""
+    days = rebuild_stats(db.session)
+    db.session.commit()
+    click.echo(f'Rebuilt reflection statistics for {days} days')
@@ -0,0 +1,186 @@
+import functools
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Background refreshes for stale-while-revalidate entries
+_refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+
+
+class _Entry:
+    __slots__ = ('value', 'fetched_at', 'ttl', 'stale_ttl')
+
+    def __init__(self, value, ttl, stale_ttl):
+        self.value = value
+        self.fetched_at = time.monotonic()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+
+class _Flight:
+    """A load in progress that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTLs, single-flight loads and stale-while-revalidate.
+
+    Keys are tuples whose first element is the source name, which is also
+    what hit/miss counters are grouped by.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, key, event):
+        self._stats.setdefault(key[0], Counter())[event] += 1
+
+    def get_or_load(self, key, loader, ttl, stale_ttl=0, should_cache=None):
+        """Return the cached value for ``key``, calling ``loader`` only when needed.
+
+        A fresh entry is returned directly. An entry past ``ttl`` but within
+        ``ttl + stale_ttl`` is returned immediately while a background refresh
+        runs. Otherwise the caller loads it; concurrent callers for the same
+        key wait for that one load instead of starting their own.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry.fetched_at
+                if age < entry.ttl:
+                    self._entries.move_to_end(key)
+                    self._count(key, 'hits')
+                    return entry.value
+                if age < entry.ttl + entry.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._count(key, 'stale_hits')
+                    if key not in self._inflight:
+                        self._inflight[key] = _Flight()
+                        self._count(key, 'refreshes')
+                        _refresher.submit(self._load, key, loader, ttl, stale_ttl, should_cache)
+                    return entry.value
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self._count(key, 'misses')
+            else:
+                self._count(key, 'coalesced')
+
+        if leader:
+            self._load(key, loader, ttl, stale_ttl, should_cache)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _load(self, key, loader, ttl, stale_ttl, should_cache):
+        flight = self._inflight[key]
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            logger.error("Error loading %s for cache: %s", key[0], e)
+
+        with self._lock:
+            if flight.error is None and (should_cache is None or should_cache(flight.value)):
+                self._entries[key] = _Entry(flight.value, ttl, stale_ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._count(evicted, 'evictions')
+            elif flight.error is not None:
+                self._count(key, 'errors')
+            del self._inflight[key]
+        flight.done.set()
+
+    def invalidate(self, source=None):
+        """Drop every entry, or only those belonging to ``source``."""
+        with self._lock:
+            for key in list(self._entries):
+                if source is None or key[0] == source:
+                    del self._entries[key]
+
+    def stats(self):
+        """Hit/miss counters per source plus the current entry count."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'sources': {source: dict(counter) for source, counter in self._stats.items()}
+            }
+
+
+# Shared cache for integration results
+integration_cache = TTLCache(maxsize=256)
+
+
+def floor_datetimes(granularity):
+    """Build a cache key function that rounds datetime arguments down to ``granularity`` seconds.
+
+    Callers usually pass ``datetime.now()``-based windows, which would never
+    produce the same key twice without rounding.
+    """
+    def floor(value):
+        if hasattr(value, 'timestamp'):
+            return int(value.timestamp()) // granularity * granularity
+        return value
+
+    def key(*args, **kwargs):
+        return (
+            tuple(floor(arg) for arg in args),
+            tuple(sorted((name, floor(value)) for name, value in kwargs.items()))
+        )
+    return key
+
+
+def cached(source, ttl, stale_ttl=None, key=None, should_cache=None):
+    """Cache an integration method's result in integration_cache.
+
+    ``source`` names the integration for stats and invalidation; ``ttl`` is
+    how long a result is fresh and ``stale_ttl`` (defaults to ``ttl``) how
+    much longer it may be served while a refresh runs in the background.
+    ``key`` maps the call arguments (excluding ``self``) to a hashable key;
+    the method name and the instance's id() are always part of the full
+    key, so two clients (say, for different accounts) never share entries.
+    Cache on long-lived clients such as get_clickup_client(): a client
+    created per request only ever misses.
+    ``None`` results are never cached unless ``should_cache`` says otherwise.
+    """
+    if stale_ttl is None:
+        stale_ttl = ttl
+    if should_cache is None:
+        should_cache = lambda result: result is not None
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if key is not None:
+                call_key = key(*args, **kwargs)
+            else:
+                call_key = (args, tuple(sorted(kwargs.items())))
+            cache_key = (source, method.__name__, id(self), call_key)
+            return integration_cache.get_or_load(
+                cache_key,
+                lambda: method(self, *args, **kwargs),
+                ttl,
+                stale_ttl,
+                should_cache
+            )
+        wrapper.uncached = method
+        return wrapper
+    return decorator
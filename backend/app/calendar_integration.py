@@ -1,15 +1,17 @@
 import os
 import logging
 import pickle
+import threading
+import time
 from datetime import datetime, timedelta
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+import click
 from flask import Blueprint, jsonify
+from flask.cli import AppGroup
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create Blueprint
@@ -18,6 +20,136 @@ calendar_bp = Blueprint('calendar', __name__)
 # If modifying these scopes, delete the file token.pickle.
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 
+# The calendar list rarely changes; refetch it at most this often (seconds)
+CALENDAR_LIST_TTL = 15 * 60
+_calendar_list_cache = {'items': None, 'fetched_at': 0}
+_calendar_list_lock = threading.Lock()
+
+# Credentials are refreshed this long before they expire
+CREDENTIAL_REFRESH_MARGIN = timedelta(minutes=5)
+_shared = {'creds': None, 'service': None}
+_shared_lock = threading.Lock()
+
+def process_event(event, calendar_id, calendar_name):
+    """Convert a Calendar API event into the format the app serves."""
+    return {
+        'title': event.get('summary', 'No Title'),
+        'start_time': event['start'].get('dateTime', event['start'].get('date')),
+        'end_time': event['end'].get('dateTime', event['end'].get('date')),
+        'description': event.get('description', ''),
+        'location': event.get('location', ''),
+        'attendees': [
+            attendee['email'] 
+            for attendee in event.get('attendees', [])
+            if not attendee.get('self', False)
+        ],
+        'calendar_id': calendar_id,
+        'calendar_name': calendar_name,
+        'event_id': event.get('id', ''),
+        'html_link': event.get('htmlLink', ''),
+        'status': event.get('status', '')
+    }
+
+def _save_credentials(creds):
+    try:
+        with open('token.pickle', 'wb') as token:
+            pickle.dump(creds, token)
+        logger.info("Saved credentials to token.pickle")
+    except Exception as e:
+        logger.error("Error saving token.pickle: %s", e)
+
+def _run_oauth_flow():
+    try:
+        flow = InstalledAppFlow.from_client_secrets_file(
+            'credentials.json', SCOPES)
+        creds = flow.run_local_server(port=0)
+        logger.info("Successfully completed OAuth flow")
+        return creds
+    except Exception as e:
+        logger.error("Error during OAuth flow: %s", e)
+        return None
+
+def _load_credentials():
+    """Load credentials from token.pickle, refreshing or running the OAuth flow as needed."""
+    # Check if credentials file exists
+    if not os.path.exists('credentials.json'):
+        logger.error("credentials.json file not found in current directory")
+        logger.info("Current working directory: %s", os.getcwd())
+        return None
+
+    creds = None
+    # The file token.pickle stores the user's access and refresh tokens
+    if os.path.exists('token.pickle'):
+        try:
+            with open('token.pickle', 'rb') as token:
+                creds = pickle.load(token)
+                logger.info("Loaded credentials from token.pickle")
+        except Exception as e:
+            logger.error("Error loading token.pickle: %s", e)
+            creds = None
+    else:
+        logger.info("No token.pickle file found")
+
+    # If there are no (valid) credentials available, let the user log in.
+    if not creds:
+        logger.info("No credentials found, starting OAuth flow")
+        creds = _run_oauth_flow()
+        if creds is None:
+            return None
+        _save_credentials(creds)
+    elif not creds.valid:
+        logger.info("Credentials exist but are not valid")
+        if creds.expired and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+                logger.info("Successfully refreshed credentials")
+            except Exception as e:
+                logger.error("Error refreshing credentials: %s", e)
+                return None
+        else:
+            logger.info("Starting new OAuth flow due to invalid credentials")
+            creds = _run_oauth_flow()
+            if creds is None:
+                return None
+        _save_credentials(creds)
+
+    return creds
+
+def _expires_soon(creds):
+    if not creds.valid:
+        return True
+    # google-auth keeps expiry as naive UTC
+    return creds.expiry is not None and creds.expiry - datetime.utcnow() < CREDENTIAL_REFRESH_MARGIN
+
+def get_calendar_service():
+    """Get the process-wide credentials and Calendar service.
+
+    token.pickle is read and the service built only once per process. The
+    discovery document comes from the copy bundled with
+    google-api-python-client instead of being downloaded. The service holds
+    a reference to the credentials, so refreshing them in place shortly
+    before they expire keeps it usable without a rebuild.
+
+    Returns ``(creds, service)``, or ``(None, None)`` if authentication fails.
+    """
+    with _shared_lock:
+        creds = _shared['creds']
+        if creds is None:
+            creds = _load_credentials()
+            if creds is None:
+                return None, None
+            _shared['creds'] = creds
+        if _expires_soon(creds) and creds.refresh_token:
+            creds.refresh(Request())
+            logger.info("Refreshed calendar credentials ahead of expiry")
+            _save_credentials(creds)
+
+        if _shared['service'] is None:
+            _shared['service'] = build('calendar', 'v3', credentials=creds,
+                                       static_discovery=True, cache_discovery=False)
+            logger.info("Successfully built Google Calendar service")
+        return creds, _shared['service']
+
 class GoogleCalendar:
     def __init__(self):
         logger.info("Initializing Google Calendar integration")
@@ -27,303 +159,68 @@ class GoogleCalendar:
             logger.error("Failed to authenticate during initialization")
         
     def authenticate(self):
-        """Authenticate with Google Calendar API"""
-        try:
-            logger.info("Starting authentication process")
-            
-            # Check if credentials file exists
-            if not os.path.exists('credentials.json'):
-                logger.error("credentials.json file not found in current directory")
-                logger.info(f"Current working directory: {os.getcwd()}")
-                return False
-            
-            # The file token.pickle stores the user's access and refresh tokens
-            if os.path.exists('token.pickle'):
-                logger.info("Found existing token.pickle file")
-                try:
-                    with open('token.pickle', 'rb') as token:
-                        self.creds = pickle.load(token)
-                        logger.info("Loaded credentials from token.pickle")
-                except Exception as e:
-                    logger.error(f"Error loading token.pickle: {str(e)}")
-                    self.creds = None
-            else:
-                logger.info("No token.pickle file found")
-                    
-            # If there are no (valid) credentials available, let the user log in.
-            if not self.creds:
-                logger.info("No credentials found, starting OAuth flow")
-                try:
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        'credentials.json', SCOPES)
-                    self.creds = flow.run_local_server(port=0)
-                    logger.info("Successfully completed OAuth flow")
-                except Exception as e:
-                    logger.error(f"Error during OAuth flow: {str(e)}")
-                    return False
-                
-                # Save the credentials for the next run
-                try:
-                    with open('token.pickle', 'wb') as token:
-                        pickle.dump(self.creds, token)
-                    logger.info("Saved new credentials to token.pickle")
-                except Exception as e:
-                    logger.error(f"Error saving token.pickle: {str(e)}")
-            elif not self.creds.valid:
-                logger.info("Credentials exist but are not valid")
-                if self.creds.expired and self.creds.refresh_token:
-                    logger.info("Attempting to refresh expired credentials")
-                    try:
-                        self.creds.refresh(Request())
-                        logger.info("Successfully refreshed credentials")
-                    except Exception as e:
-                        logger.error(f"Error refreshing credentials: {str(e)}")
-                        return False
-                else:
-                    logger.info("Starting new OAuth flow due to invalid credentials")
-                    try:
-                        flow = InstalledAppFlow.from_client_secrets_file(
-                            'credentials.json', SCOPES)
-                        self.creds = flow.run_local_server(port=0)
-                        logger.info("Successfully completed OAuth flow")
-                    except Exception as e:
-                        logger.error(f"Error during OAuth flow: {str(e)}")
-                        return False
-                    
-                # Save the refreshed/new credentials
-                try:
-                    with open('token.pickle', 'wb') as token:
-                        pickle.dump(self.creds, token)
-                    logger.info("Saved credentials to token.pickle")
-                except Exception as e:
-                    logger.error(f"Error saving token.pickle: {str(e)}")
+        """Authenticate with Google Calendar API
 
-            try:
-                self.service = build('calendar', 'v3', credentials=self.creds)
-                logger.info("Successfully built Google Calendar service")
-                return True
-            except Exception as e:
-                logger.error(f"Error building calendar service: {str(e)}")
-                return False
-            
-        except Exception as e:
-            logger.error(f"Error during authentication: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return False
-    
-    def get_events(self, start_date, end_date):
-        """Get events between start_date and end_date from all calendars"""
+        Cheap after the first call in a process; see get_calendar_service().
+        """
         try:
-            if not self.service:
-                logger.error("No service available")
-                if not self.authenticate():
-                    logger.error("Authentication failed in get_events")
-                    return None
-                    
-            # Convert dates to RFC3339 timestamp
-            start = start_date.isoformat() + 'Z'
-            end = end_date.isoformat() + 'Z'
-            
-            logger.info(f"Fetching events from {start} to {end}")
-            
-            try:
-                # Get list of all calendars
-                logger.info("Fetching calendar list")
-                calendar_list = self.service.calendarList().list().execute()
-                calendars = calendar_list.get('items', [])
-                logger.info(f"Found {len(calendars)} calendars:")
-                for cal in calendars:
-                    logger.info(f"Calendar: {cal.get('summary')} ({cal.get('id')})")
-                    logger.info(f"Access Role: {cal.get('accessRole')}")
-                    logger.info(f"Selected: {cal.get('selected', False)}")
-                    logger.info(f"Hidden: {cal.get('hidden', False)}")
-                    logger.info("---")
-                
-            except Exception as e:
-                logger.error(f"Error accessing calendars: {str(e)}")
-                import traceback
-                logger.error(traceback.format_exc())
-                return None
-            
-            # Fetch events from each calendar
-            all_events = []
-            for calendar in calendars:
-                calendar_id = calendar.get('id')
-                calendar_name = calendar.get('summary', 'Unknown Calendar')
-                
-                # Skip if calendar is hidden
-                if calendar.get('hidden', False):
-                    logger.info(f"Skipping hidden calendar {calendar_name}")
-                    continue
-                
-                logger.info(f"\nProcessing calendar: {calendar_name}")
-                logger.info(f"Calendar ID: {calendar_id}")
-                
-                try:
-                    # Get events with detailed logging
-                    logger.info(f"Requesting events for {calendar_name} between {start} and {end}")
-                    events_result = self.service.events().list(
-                        calendarId=calendar_id,
-                        timeMin=start,
-                        timeMax=end,
-                        singleEvents=True,
-                        orderBy='startTime',
-                        maxResults=2500  # Increased from default
-                    ).execute()
-                    
-                    events = events_result.get('items', [])
-                    logger.info(f"Found {len(events)} events in {calendar_name}")
-                    
-                    if not events:
-                        logger.info(f"No events found in calendar {calendar_name}")
-                        continue
-                    
-                    # Process events into a more usable format
-                    for event in events:
-                        try:
-                            start_time = event['start'].get('dateTime', event['start'].get('date'))
-                            end_time = event['end'].get('dateTime', event['end'].get('date'))
-                            title = event.get('summary', 'No Title')
-                            
-                            logger.info(f"Processing event: {title} at {start_time}")
-                            
-                            processed_event = {
-                                'title': title,
-                                'start_time': start_time,
-                                'end_time': end_time,
-                                'description': event.get('description', ''),
-                                'location': event.get('location', ''),
-                                'attendees': [
-                                    attendee['email'] 
-                                    for attendee in event.get('attendees', [])
-                                    if not attendee.get('self', False)
-                                ],
-                                'calendar_id': calendar_id,
-                                'calendar_name': calendar_name,
-                                'event_id': event.get('id', ''),
-                                'html_link': event.get('htmlLink', ''),
-                                'status': event.get('status', '')
-                            }
-                            all_events.append(processed_event)
-                            logger.info(f"Added event: {title} from {calendar_name}")
-                        except Exception as e:
-                            logger.error(f"Error processing event in {calendar_name}: {str(e)}")
-                            logger.error(f"Event data: {event}")
-                            continue
-                            
-                except Exception as e:
-                    logger.error(f"Error fetching events from calendar {calendar_name}: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    continue
-            
-            logger.info(f"\nTotal events found across all calendars: {len(all_events)}")
-            return all_events
-            
+            self.creds, self.service = get_calendar_service()
+            return self.service is not None
         except Exception as e:
-            logger.error(f"Error getting events: {str(e)}")
-            logger.error(traceback.format_exc())
-            return None
+            logger.error("Error during authentication: %s", e, exc_info=True)
+            return False
     
-    def get_recent_events(self):
-        """Get events from yesterday and today"""
-        try:
-            yesterday = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
-            tomorrow = yesterday + timedelta(days=2)
-            
-            events = self.get_events(yesterday, tomorrow)
-            if not events:
-                return {
-                    'status': 'error',
-                    'message': 'Failed to fetch events'
-                }
-            
-            # Group events by date
-            days = {}
-            for event in events:
-                # Get date from start_time
-                event_date = event['start_time'].split('T')[0]
-                if event_date not in days:
-                    days[event_date] = []
-                days[event_date].append(event)
-            
-            # Convert to list and sort by date
-            days_list = [
-                {
-                    'date': date,
-                    'events': sorted(events, key=lambda x: x['start_time'])
-                }
-                for date, events in sorted(days.items())
-            ]
-            
-            return {
-                'status': 'success',
-                'total_events': len(events),
-                'days': days_list
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting recent events: {str(e)}")
-            return {
-                'status': 'error',
-                'message': f'Error getting recent events: {str(e)}'
-            }
+    def get_calendars(self):
+        """Get the calendar list, reusing it for CALENDAR_LIST_TTL seconds."""
+        with _calendar_list_lock:
+            if _calendar_list_cache['items'] is not None and \
+                    time.monotonic() - _calendar_list_cache['fetched_at'] < CALENDAR_LIST_TTL:
+                return _calendar_list_cache['items']
+
+            calendars = []
+            page_token = None
+            while True:
+                calendar_list = self.service.calendarList().list(pageToken=page_token).execute()
+                calendars.extend(calendar_list.get('items', []))
+                page_token = calendar_list.get('nextPageToken')
+                if not page_token:
+                    break
+
+            _calendar_list_cache['items'] = calendars
+            _calendar_list_cache['fetched_at'] = time.monotonic()
+            return calendars
+
+_client = None
+_client_lock = threading.Lock()
 
 def get_calendar_client():
-    """Get an instance of the GoogleCalendar client"""
+    """Get the process-wide GoogleCalendar client, or None if authentication fails"""
+    global _client
     try:
-        client = GoogleCalendar()
-        if client.authenticate():
-            return client
-        return None
+        with _client_lock:
+            if _client is None:
+                _client = GoogleCalendar()
+            elif not _client.authenticate():
+                return None
+            return _client if _client.service else None
     except Exception as e:
-        logger.error(f"Error creating calendar client: {str(e)}")
+        logger.error("Error creating calendar client: %s", e)
         return None
 
 @calendar_bp.route('/api/calendar/events/recent', methods=['GET'])
 def get_recent_events():
-    """Get events from yesterday and today"""
+    """Get events from yesterday and today
+
+    Served from the local event store kept up to date by calendar_sync.
+    """
+    from .calendar_sync import get_local_events, get_last_synced
     try:
-        logger.info("Starting to fetch recent events")
-        
-        # Initialize calendar client
-        calendar = GoogleCalendar()
-        
-        # Try to authenticate again if service is not initialized
-        if not calendar.service:
-            logger.info("Service not initialized, attempting to authenticate again")
-            if not calendar.authenticate():
-                logger.error("Failed to authenticate after OAuth flow")
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Authentication failed after OAuth flow'
-                }), 500
-        
         # Get date range
         today = datetime.now()
         yesterday = today - timedelta(days=1)
         tomorrow = today + timedelta(days=1)
         
-        logger.info(f"Fetching events between {yesterday} and {tomorrow}")
-        
-        # Get events
-        events = calendar.get_events(yesterday, tomorrow)
-        if events is None:
-            logger.error("Failed to fetch events from calendar")
-            # Try to authenticate one more time
-            logger.info("Attempting to re-authenticate and fetch events")
-            if calendar.authenticate():
-                events = calendar.get_events(yesterday, tomorrow)
-                if events is None:
-                    return jsonify({
-                        'status': 'error',
-                        'message': 'Failed to fetch events even after re-authentication'
-                    }), 500
-            else:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Failed to fetch events and re-authentication failed'
-                }), 500
+        events = get_local_events(yesterday, tomorrow)
             
         # Group events by date
         events_by_date = {}
@@ -334,12 +231,13 @@ def get_recent_events():
                     events_by_date[event_date] = []
                 events_by_date[event_date].append(event)
             except Exception as e:
-                logger.error(f"Error processing event date: {str(e)}")
+                logger.error("Error processing event date: %s", e)
                 continue
         
         return jsonify({
             'status': 'success',
             'total_events': len(events),
+            'last_synced': get_last_synced(),
             'days': [
                 {
                     'date': date,
@@ -350,10 +248,22 @@ def get_recent_events():
         })
         
     except Exception as e:
-        logger.error(f"Error in get_recent_events: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.error("Error in get_recent_events: %s", e, exc_info=True)
         return jsonify({
             'status': 'error',
             'message': f'Failed to fetch events: {str(e)}'
-        }), 500 
\ No newline at end of file
+        }), 500
+
+calendar_cli = AppGroup('calendar', help='Google Calendar commands.')
+
+
+@calendar_cli.command('auth')
+def auth_command():
+    """Run the Google OAuth flow in a browser and save token.pickle.
+
+    Calendar sync stays idle until this has been done once.
+    """
+    creds = _load_credentials()
+    if creds is None:
+        raise click.ClickException('Google Calendar authorization failed; see the log for details')
+    click.echo('Saved Google Calendar credentials to token.pickle')
@@ -0,0 +1,237 @@
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from googleapiclient.errors import HttpError
+from sqlalchemy.dialects.sqlite import insert
+from .models import db, CalendarEvent, SyncState
+from .calendar_integration import get_calendar_client, process_event
+
+logger = logging.getLogger(__name__)
+
+SYNC_SOURCE_PREFIX = 'calendar:'
+
+# How far back a full sync reaches; later changes arrive through sync tokens
+FULL_SYNC_PAST = timedelta(days=30)
+
+EVENTS_PAGE_SIZE = 250
+
+# Google accepts up to 50 calls in one batch request
+BATCH_SIZE = 50
+
+
+def _to_utc(value):
+    """Parse an API dateTime or all-day date into a naive UTC datetime."""
+    if 'T' not in value:
+        # All-day events start at local midnight
+        return datetime.fromisoformat(value).astimezone(timezone.utc).replace(tzinfo=None)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        return parsed
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _event_row(event, calendar_id, calendar_name):
+    processed = process_event(event, calendar_id, calendar_name)
+    return {
+        'calendar_id': calendar_id,
+        'event_id': processed['event_id'],
+        'calendar_name': calendar_name,
+        'title': processed['title'],
+        'description': processed['description'],
+        'location': processed['location'],
+        'attendees': json.dumps(processed['attendees']),
+        'html_link': processed['html_link'],
+        'status': processed['status'],
+        'start_time': processed['start_time'],
+        'end_time': processed['end_time'],
+        'start_utc': _to_utc(processed['start_time']),
+        'end_utc': _to_utc(processed['end_time']),
+        'synced_at': datetime.utcnow()
+    }
+
+
+def _upsert(rows):
+    stmt = insert(CalendarEvent)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CalendarEvent.calendar_id, CalendarEvent.event_id],
+        set_={column: stmt.excluded[column] for column in rows[0] if column not in ('calendar_id', 'event_id')}
+    )
+    db.session.execute(stmt, rows)
+
+
+def _apply_page(events, calendar_id, calendar_name):
+    """Write a calendar's changed events; cancelled events are removed from the store."""
+    rows = []
+    cancelled = []
+    for event in events:
+        if event.get('status') == 'cancelled':
+            cancelled.append(event['id'])
+        elif 'start' in event and 'end' in event:
+            rows.append(_event_row(event, calendar_id, calendar_name))
+    if rows:
+        _upsert(rows)
+    if cancelled:
+        CalendarEvent.query.filter(
+            CalendarEvent.calendar_id == calendar_id,
+            CalendarEvent.event_id.in_(cancelled)
+        ).delete(synchronize_session=False)
+    return len(rows) + len(cancelled)
+
+
+def _list_params(calendar_id, cursor):
+    """events().list arguments for an incremental pull, or a full one without a cursor."""
+    params = {'calendarId': calendar_id, 'singleEvents': True, 'maxResults': EVENTS_PAGE_SIZE}
+    if cursor:
+        params['syncToken'] = cursor
+    else:
+        params['timeMin'] = (datetime.utcnow() - FULL_SYNC_PAST).isoformat() + 'Z'
+    return params
+
+
+def _fetch_changes(service, pulls):
+    """Page through events().list for every pull, BATCH_SIZE requests per batched HTTP call.
+
+    Every calendar's next page goes into the same round, so a sync with no
+    changes costs one HTTP round trip however many calendars there are.
+    Each pull collects its ``items`` and finally its ``sync_token``, or an
+    ``error``. A pull whose syncToken has expired (410 Gone) is restarted as
+    a full pull in a later round.
+    """
+    pending = [(pull, None) for pull in pulls]
+    while pending:
+        round_requests, pending = pending[:BATCH_SIZE], pending[BATCH_SIZE:]
+        responses = {}
+
+        def collect(request_id, response, exception):
+            responses[request_id] = (response, exception)
+
+        batch = service.new_batch_http_request(callback=collect)
+        for i, (pull, page_token) in enumerate(round_requests):
+            batch.add(service.events().list(pageToken=page_token, **pull['params']), request_id=str(i))
+        batch.execute()
+
+        for i, (pull, _) in enumerate(round_requests):
+            response, exception = responses.get(str(i), (None, None))
+            if isinstance(exception, HttpError) and exception.resp.status == 410 and not pull['full']:
+                logger.info("Sync token for %s expired, running a full resync", pull['name'])
+                pull.update(full=True, items=[], params=_list_params(pull['calendar_id'], None))
+                pending.append((pull, None))
+            elif exception is not None or response is None:
+                pull['error'] = exception or RuntimeError('no response in batch')
+            else:
+                pull['items'].extend(response.get('items', []))
+                if response.get('nextPageToken'):
+                    pending.append((pull, response['nextPageToken']))
+                else:
+                    pull['sync_token'] = response.get('nextSyncToken')
+
+
+def _apply_pull(pull):
+    """Write one calendar's completed pull and its new sync token, in one transaction.
+
+    A full pull replaces the calendar's stored events.
+    """
+    calendar_id = pull['calendar_id']
+    if pull['full']:
+        CalendarEvent.query.filter_by(calendar_id=calendar_id).delete(synchronize_session=False)
+    changed = _apply_page(pull['items'], calendar_id, pull['name'])
+
+    now = datetime.utcnow()
+    state = pull['state']
+    state.cursor = pull['sync_token']
+    state.synced_at = now
+    if pull['full']:
+        state.full_synced_at = now
+    db.session.merge(state)
+    db.session.commit()
+
+    logger.debug("Calendar %s %s sync applied %d changes", pull['name'], 'full' if pull['full'] else 'incremental', changed)
+    return changed
+
+
+def sync_calendars(client=None):
+    """Sync every visible calendar and drop events from calendars that are gone or hidden.
+
+    Must run inside an app context. Calendars with a stored syncToken only
+    fetch what changed since; the rest (or those whose token expired) are
+    reloaded from FULL_SYNC_PAST onwards. All calendars are fetched together
+    through batched requests, then each is written in its own transaction, so
+    one failing calendar keeps its previous events and token.
+    """
+    client = client or get_calendar_client()
+    if client is None:
+        raise RuntimeError("Google Calendar client is not available")
+
+    calendars = [calendar for calendar in client.get_calendars() if not calendar.get('hidden', False)]
+    pulls = []
+    for calendar in calendars:
+        source = SYNC_SOURCE_PREFIX + calendar['id']
+        state = db.session.get(SyncState, source) or SyncState(source=source)
+        pulls.append({
+            'calendar_id': calendar['id'],
+            'name': calendar.get('summary', 'Unknown Calendar'),
+            'state': state,
+            'full': not state.cursor,
+            'params': _list_params(calendar['id'], state.cursor),
+            'items': [],
+            'sync_token': None,
+            'error': None
+        })
+    _fetch_changes(client.service, pulls)
+
+    changed = 0
+    for pull in pulls:
+        if pull['error'] is not None:
+            logger.error("Error syncing calendar %s: %s", pull['name'], pull['error'])
+            continue
+        try:
+            changed += _apply_pull(pull)
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Error syncing calendar %s: %s", pull['name'], e)
+
+    visible_ids = [calendar['id'] for calendar in calendars]
+    CalendarEvent.query.filter(CalendarEvent.calendar_id.notin_(visible_ids)).delete(synchronize_session=False)
+    SyncState.query.filter(
+        SyncState.source.startswith(SYNC_SOURCE_PREFIX),
+        SyncState.source.notin_([SYNC_SOURCE_PREFIX + calendar_id for calendar_id in visible_ids])
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+    logger.info("Calendar sync applied %d changes across %d calendars", changed, len(calendars))
+    return changed
+
+
+def get_local_events(start_date, end_date):
+    """Get stored events overlapping [start_date, end_date), in the process_event format.
+
+    Naive bounds are taken as local time (what ``datetime.now()`` gives) and
+    converted to UTC before being compared with the stored UTC times.
+    """
+    start_date = start_date.astimezone(timezone.utc).replace(tzinfo=None)
+    end_date = end_date.astimezone(timezone.utc).replace(tzinfo=None)
+    events = CalendarEvent.query.filter(
+        CalendarEvent.start_utc < end_date,
+        CalendarEvent.end_utc > start_date
+    ).order_by(CalendarEvent.start_utc)
+    return [{
+        'title': event.title,
+        'start_time': event.start_time,
+        'end_time': event.end_time,
+        'description': event.description,
+        'location': event.location,
+        'attendees': json.loads(event.attendees or '[]'),
+        'calendar_id': event.calendar_id,
+        'calendar_name': event.calendar_name,
+        'event_id': event.event_id,
+        'html_link': event.html_link,
+        'status': event.status
+    } for event in events]
+
+
+def get_last_synced():
+    """ISO timestamp (UTC) of the most recent calendar sync, or None if never synced."""
+    synced_at = db.session.query(db.func.max(SyncState.synced_at)).filter(
+        SyncState.source.startswith(SYNC_SOURCE_PREFIX)
+    ).scalar()
+    return synced_at.isoformat() + 'Z' if synced_at else None
@@ -1,20 +1,63 @@
 import os
 import logging
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
 from flask import Blueprint, jsonify
+from .cache import cached
 import time
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create Blueprint
 clickup_bp = Blueprint('clickup', __name__, url_prefix='/api/clickup')
 
+# How long a resolved workspace ID is trusted before /team is asked again
+WORKSPACE_ID_TTL = 60 * 60
+
+# ClickUp allows 100 requests/minute; stay just under it
+RATE_LIMIT_PER_MINUTE = 95
+RATE_LIMIT_BURST = 5
+
+# Worker threads used to crawl spaces -> folders -> lists -> tasks
+CRAWL_WORKERS = 8
+
+# (connect, read) timeout in seconds for every ClickUp call, kept within the
+# overview's ClickUp deadline so a hung socket can't hold a worker forever
+REQUEST_TIMEOUT = (3.05, 8)
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker making ClickUp calls."""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
 class ClickUpClient:
     def __init__(self):
-        """Initialize the ClickUp client with API key from environment variables."""
+        """Initialize the ClickUp client with API key from environment variables.
+
+        No request is made here; the workspace ID is resolved lazily on first
+        use. Use get_clickup_client() to share one client across requests.
+        """
         self.api_key = os.getenv('CLICKUP_API_KEY')
         if not self.api_key:
             logger.error("No ClickUp API key found in environment variables")
@@ -25,60 +68,70 @@ class ClickUpClient:
             "Authorization": self.api_key,
             "Content-Type": "application/json"
         }
+
+        # Keep-alive session so requests reuse pooled TCP/TLS connections
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
         
-        self.requests_this_minute = 0
-        self.minute_start = time.time()
+        self.rate_limiter = TokenBucket(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+
+        self._workspace_id = None
+        self._workspace_resolved_at = 0
+        self._workspace_lock = threading.Lock()
         
         logger.info("Initializing ClickUp client...")
-        
-        # Test the API key with a simple request
-        test_response = requests.get(f"{self.base_url}/team", headers=self.headers)
-        if test_response.status_code != 200:
-            logger.error(f"API key test failed. Status code: {test_response.status_code}")
-            raise ValueError("Invalid API key or API access denied")
-            
-        # Get workspace ID from the test response
-        try:
-            data = test_response.json()
-            teams = data.get('teams', [])
-            if not teams:
-                raise ValueError("No workspaces found")
-                
-            self.workspace_id = teams[0]['id']
-            logger.info(f"ClickUp client initialized with workspace ID: {self.workspace_id}")
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize ClickUp client: {str(e)}")
-            raise ValueError(f"Failed to initialize ClickUp client: {str(e)}")
+
+    @property
+    def workspace_id(self):
+        """Workspace ID from GET /team, cached for WORKSPACE_ID_TTL seconds."""
+        with self._workspace_lock:
+            if self._workspace_id and time.time() - self._workspace_resolved_at < WORKSPACE_ID_TTL:
+                return self._workspace_id
+
+            # Test the API key with a simple request
+            test_response = self._make_request("GET", f"{self.base_url}/team")
+            if test_response.status_code != 200:
+                logger.error("API key test failed. Status code: %s", test_response.status_code)
+                raise ValueError("Invalid API key or API access denied")
+
+            # Get workspace ID from the test response
+            try:
+                data = test_response.json()
+                teams = data.get('teams', [])
+                if not teams:
+                    raise ValueError("No workspaces found")
+
+                self._workspace_id = teams[0]['id']
+                self._workspace_resolved_at = time.time()
+                logger.info("ClickUp client resolved workspace ID: %s", self._workspace_id)
+                return self._workspace_id
+
+            except Exception as e:
+                logger.error("Failed to resolve ClickUp workspace: %s", e)
+                raise ValueError(f"Failed to resolve ClickUp workspace: {str(e)}")
 
     def _make_request(self, method, url, **kwargs):
-        """Make a request to the ClickUp API with rate limiting."""
-        current_time = time.time()
-        if current_time - self.minute_start >= 60:
-            self.requests_this_minute = 0
-            self.minute_start = current_time
-        elif self.requests_this_minute >= 95:
-            wait_time = 60 - (current_time - self.minute_start)
-            logger.info(f"Rate limit approaching. Waiting {wait_time:.2f} seconds...")
-            time.sleep(wait_time)
-            self.requests_this_minute = 0
-            self.minute_start = time.time()
+        """Make a request to the ClickUp API with rate limiting and REQUEST_TIMEOUT.
 
-        response = requests.request(method, url, headers=self.headers, **kwargs)
-        self.requests_this_minute += 1
-        return response
+        The request budget is shared by every thread using this client.
+        """
+        self.rate_limiter.acquire()
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        return self.session.request(method, url, **kwargs)
 
     def get_spaces(self, workspace_id):
         """Get all spaces in a workspace"""
         try:
-            logger.info(f"Fetching spaces for workspace {workspace_id}")
+            logger.info("Fetching spaces for workspace %s", workspace_id)
             response = self._make_request("GET", f"{self.base_url}/team/{workspace_id}/space")
             response.raise_for_status()
             spaces = response.json().get('spaces', [])
-            logger.info(f"Found {len(spaces)} spaces")
+            logger.info("Found %d spaces", len(spaces))
             return spaces
         except Exception as e:
-            logger.error(f"Error getting spaces: {str(e)}")
+            logger.error("Error getting spaces: %s", e)
             return []
 
     def get_folders(self, space_id):
@@ -88,11 +141,11 @@ class ClickUpClient:
             response = self._make_request("GET", url)
             if response.status_code == 200:
                 folders = response.json()["folders"]
-                logger.info(f"Found {len(folders)} folders in space {space_id}")
+                logger.debug("Found %d folders in space %s", len(folders), space_id)
                 return folders
             return []
         except Exception as e:
-            logger.error(f"Error getting folders: {str(e)}")
+            logger.error("Error getting folders: %s", e)
             return []
 
     def get_lists_in_folder(self, folder_id):
@@ -102,79 +155,159 @@ class ClickUpClient:
             response = self._make_request("GET", url)
             if response.status_code == 200:
                 lists = response.json()["lists"]
-                logger.info(f"Found {len(lists)} lists in folder {folder_id}")
+                logger.debug("Found %d lists in folder %s", len(lists), folder_id)
                 return lists
             return []
         except Exception as e:
-            logger.error(f"Error getting lists in folder: {str(e)}")
+            logger.error("Error getting lists in folder: %s", e)
             return []
 
-    def get_tasks(self, start_date=None, end_date=None):
-        """Get tasks from ClickUp within the specified date range."""
-        all_tasks = []
+    def get_folderless_lists(self, space_id):
+        """Get all lists that sit directly in a space, outside any folder."""
         try:
-            spaces = self.get_spaces(self.workspace_id)
-            for space in spaces:
-                space_id = space.get('id')
-                folders = self.get_folders(space_id)
-                
-                for folder in folders:
-                    lists = self.get_lists_in_folder(folder['id'])
-                    for list_data in lists:
-                        tasks = self._get_tasks_from_list(list_data['id'], start_date, end_date)
-                        all_tasks.extend(tasks)
-            
-            return all_tasks
-        except Exception as e:
-            logger.error(f"Error getting tasks: {str(e)}")
-            return []
-
-    def _get_tasks_from_list(self, list_id, start_date=None, end_date=None):
-        """Helper method to get tasks from a specific list."""
-        tasks = []
-        try:
-            params = {
-                'include_closed': 'true',
-                'subtasks': 'true',
-                'order_by': 'due_date'
-            }
-            
-            response = self._make_request("GET", f"{self.base_url}/list/{list_id}/task", params=params)
+            url = f"{self.base_url}/space/{space_id}/list"
+            response = self._make_request("GET", url)
             if response.status_code == 200:
-                tasks_data = response.json().get('tasks', [])
-                for task in tasks_data:
-                    due_date_ms = task.get('due_date')
-                    if not due_date_ms:
-                        continue
-                        
-                    due_date = datetime.fromtimestamp(int(due_date_ms) / 1000)
-                    if start_date and due_date < start_date:
-                        continue
-                    if end_date and due_date > end_date:
-                        continue
-                        
-                    tasks.append(task)
-            
-            return tasks
+                lists = response.json()["lists"]
+                logger.debug("Found %d folderless lists in space %s", len(lists), space_id)
+                return lists
+            return []
         except Exception as e:
-            logger.error(f"Error getting tasks from list: {str(e)}")
+            logger.error("Error getting folderless lists: %s", e)
             return []
 
+    def _crawl_lists(self, pool, spaces):
+        """Yield ``(space, folder, lists)`` for each folder and space as soon as its lists arrive.
+
+        ``folder`` is None for the lists sitting directly in a space. Folder
+        and list lookups are submitted to ``pool`` so sibling spaces and
+        folders are fetched concurrently.
+        """
+        pending = {}
+        for space in spaces:
+            pending[pool.submit(self.get_folders, space['id'])] = (space, None, True)
+            pending[pool.submit(self.get_folderless_lists, space['id'])] = (space, None, False)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                space, folder, is_folder_listing = pending.pop(future)
+                if is_folder_listing:
+                    for folder in future.result():
+                        pending[pool.submit(self.get_lists_in_folder, folder['id'])] = (space, folder, False)
+                else:
+                    yield space, folder, future.result()
+
+    @cached('clickup', ttl=300, should_cache=bool)
+    def get_hierarchy(self):
+        """Every space with its folders, their lists, and the lists outside any folder.
+
+        Spaces keep ClickUp's order; folders appear in the order their lists
+        were fetched. The structure rarely changes, so it is cached for five
+        minutes (an empty result, e.g. from a failed space lookup, is not).
+        """
+        spaces = self.get_spaces(self.workspace_id)
+        result = {
+            space['id']: {'space_id': space['id'], 'name': space['name'], 'folders': [], 'lists': []}
+            for space in spaces
+        }
+        with ThreadPoolExecutor(max_workers=CRAWL_WORKERS, thread_name_prefix='clickup-crawl') as pool:
+            for space, folder, lists in self._crawl_lists(pool, spaces):
+                lists = [{
+                    'list_id': lst['id'],
+                    'name': lst['name'],
+                    'task_count': lst.get('task_count', 0)
+                } for lst in lists]
+                if folder is None:
+                    result[space['id']]['lists'] = lists
+                else:
+                    result[space['id']]['folders'].append({
+                        'folder_id': folder['id'],
+                        'name': folder['name'],
+                        'lists': lists
+                    })
+        return list(result.values())
+
+    def iter_workspace_tasks(self, updated_since=None, due_after=None, due_before=None):
+        """Yield every task in the workspace, optionally only those updated since a time.
+
+        ``updated_since`` is a millisecond timestamp sent as date_updated_gt.
+        ``due_after``/``due_before`` are datetimes sent as due_date_gt and
+        due_date_lt, so only tasks due in that window are downloaded (tasks
+        without a due date are then left out). Closed tasks and subtasks are
+        included so a local mirror sees every change.
+        """
+        params = {
+            'include_closed': 'true',
+            'subtasks': 'true',
+            'order_by': 'updated'
+        }
+        if updated_since:
+            params['date_updated_gt'] = int(updated_since)
+        if due_after:
+            params['due_date_gt'] = int(due_after.timestamp() * 1000)
+        if due_before:
+            params['due_date_lt'] = int(due_before.timestamp() * 1000)
+        yield from self._iter_task_pages(f"{self.base_url}/team/{self.workspace_id}/task", params)
+
+    def _iter_task_pages(self, url, params):
+        """Yield tasks from a paginated task endpoint until the last page.
+
+        Raises RuntimeError if a page fails, so callers can't mistake a
+        truncated pull for a complete one.
+        """
+        params = dict(params)
+        page = 0
+        while True:
+            params['page'] = page
+            response = self._make_request("GET", url, params=params)
+            if response.status_code != 200:
+                logger.error("Error getting tasks from %s page %d. Status code: %s", url, page, response.status_code)
+                raise RuntimeError(f"ClickUp returned {response.status_code} for {url} page {page}")
+
+            data = response.json()
+            tasks_data = data.get('tasks', [])
+            yield from tasks_data
+
+            # ClickUp pages hold up to 100 tasks; older responses omit last_page
+            last_page = data.get('last_page')
+            if last_page is None:
+                last_page = len(tasks_data) < 100
+            if last_page or not tasks_data:
+                return
+            page += 1
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_clickup_client():
+    """Get the process-wide ClickUpClient, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ClickUpClient()
+        return _client
+
 @clickup_bp.route('/tasks/recent', methods=['GET'])
 def get_recent_tasks():
-    """Get tasks from the past week and upcoming month."""
+    """Get tasks from the past week and upcoming month.
+
+    Served from the local task mirror kept up to date by clickup_sync.
+    """
+    from .clickup_sync import get_local_tasks, get_last_synced
     try:
-        clickup = ClickUpClient()
         today = datetime.now()
         start_date = today - timedelta(days=7)
         end_date = today + timedelta(days=30)
         
-        tasks = clickup.get_tasks(start_date, end_date)
+        tasks = get_local_tasks(start_date, end_date)
+        last_synced = get_last_synced()
         
         if not tasks:
             return jsonify({
                 'status': 'success',
                 'total_tasks': 0,
+                'last_synced': last_synced,
                 'days': []
             })
         
@@ -202,11 +335,12 @@ def get_recent_tasks():
         return jsonify({
             'status': 'success',
             'total_tasks': len(tasks),
+            'last_synced': last_synced,
             'days': days_list
         })
         
     except Exception as e:
-        logger.error(f"Error in get_recent_tasks: {str(e)}")
+        logger.error("Error in get_recent_tasks: %s", e)
         return jsonify({
             'status': 'error',
             'message': str(e)
@@ -214,38 +348,9 @@ def get_recent_tasks():
 
 @clickup_bp.route('/spaces/folders', methods=['GET'])
 def get_space_folders():
-    """Get all folders and their lists for each space."""
+    """Get all folders and their lists for each space, plus each space's folderless lists."""
     try:
-        clickup = ClickUpClient()
-        spaces = clickup.get_spaces(clickup.workspace_id)
-        result = []
-        
-        for space in spaces:
-            space_data = {
-                "space_id": space["id"],
-                "name": space["name"],
-                "folders": []
-            }
-            
-            folders = clickup.get_folders(space["id"])
-            for folder in folders:
-                folder_data = {
-                    "folder_id": folder["id"],
-                    "name": folder["name"],
-                    "lists": []
-                }
-                
-                lists = clickup.get_lists_in_folder(folder["id"])
-                folder_data["lists"] = [{
-                    "list_id": lst["id"],
-                    "name": lst["name"],
-                    "task_count": lst.get("task_count", 0)
-                } for lst in lists]
-                
-                space_data["folders"].append(folder_data)
-            
-            result.append(space_data)
-        
-        return jsonify({"status": "success", "spaces": result})
+        clickup = get_clickup_client()
+        return jsonify({"status": "success", "spaces": clickup.get_hierarchy()})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500 
\ No newline at end of file
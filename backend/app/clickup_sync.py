@@ -0,0 +1,137 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.sqlite import insert
+from .models import db, ClickUpTask, SyncState
+from .clickup_integration import get_clickup_client
+
+logger = logging.getLogger(__name__)
+
+SYNC_SOURCE = 'clickup'
+
+# A full pull also drops tasks that were deleted upstream, which the
+# date_updated_gt feed never reports.
+FULL_SYNC_INTERVAL = timedelta(hours=24)
+
+# Due-date window of a full pull. Every view of the mirror reads inside it
+# (at most a week back and a month ahead), so older closed tasks and far
+# future ones are not downloaded again each day.
+FULL_SYNC_PAST = timedelta(days=30)
+FULL_SYNC_AHEAD = timedelta(days=120)
+
+# Re-read a little before the last cursor so clock skew never loses an update
+CURSOR_OVERLAP_MS = 60 * 1000
+
+UPSERT_BATCH_SIZE = 500
+
+
+def _task_row(task):
+    """Flatten a ClickUp task payload into a ClickUpTask row."""
+    status = task.get('status') or {}
+    priority = task.get('priority') or {}
+    return {
+        'id': task['id'],
+        'name': task.get('name'),
+        'status': status.get('status'),
+        'closed': status.get('type') == 'closed',
+        'priority': priority.get('priority'),
+        'due_date': int(task['due_date']) if task.get('due_date') else None,
+        'date_updated': int(task['date_updated']) if task.get('date_updated') else None,
+        'list_id': (task.get('list') or {}).get('id'),
+        'url': task.get('url'),
+        'data': json.dumps(task),
+        'synced_at': datetime.utcnow()
+    }
+
+
+def _upsert(rows):
+    stmt = insert(ClickUpTask)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ClickUpTask.id],
+        set_={column: stmt.excluded[column] for column in rows[0] if column != 'id'}
+    )
+    db.session.execute(stmt, rows)
+
+
+def sync_clickup_tasks(client=None, full=False):
+    """Bring the local ClickUp mirror up to date. Must run inside an app context.
+
+    The first run (or one every FULL_SYNC_INTERVAL) pulls every task due
+    within FULL_SYNC_PAST/FULL_SYNC_AHEAD of now and removes mirrored tasks
+    in that window (or without a due date) that it didn't see. Other runs
+    only ask ClickUp for tasks updated since the previous sync, whatever
+    their due date. Returns the number of tasks written.
+
+    If any page fails the whole sync is rolled back and the error re-raised;
+    stale tasks are only pruned, and the cursor only advanced, after a
+    complete pull.
+    """
+    client = client or get_clickup_client()
+    state = db.session.get(SyncState, SYNC_SOURCE) or SyncState(source=SYNC_SOURCE)
+    now = datetime.utcnow()
+    full = full or not state.cursor or not state.full_synced_at or now - state.full_synced_at > FULL_SYNC_INTERVAL
+
+    started_ms = int(time.time() * 1000)
+    updated_since = None if full else int(state.cursor) - CURSOR_OVERLAP_MS
+    local_now = datetime.now()
+    window = (local_now - FULL_SYNC_PAST, local_now + FULL_SYNC_AHEAD) if full else (None, None)
+
+    seen_ids = set()
+    batch = []
+    written = 0
+    try:
+        for task in client.iter_workspace_tasks(updated_since=updated_since, due_after=window[0], due_before=window[1]):
+            batch.append(_task_row(task))
+            seen_ids.add(task['id'])
+            if len(batch) >= UPSERT_BATCH_SIZE:
+                _upsert(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            _upsert(batch)
+            written += len(batch)
+    except Exception:
+        # An incomplete pull must not prune tasks or move the cursor past
+        # pages that were never read
+        db.session.rollback()
+        raise
+
+    if full:
+        in_window = db.or_(
+            ClickUpTask.due_date.is_(None),
+            ClickUpTask.due_date.between(int(window[0].timestamp() * 1000), int(window[1].timestamp() * 1000))
+        )
+        stale_ids = [task_id for (task_id,) in db.session.query(ClickUpTask.id).filter(in_window)
+                     if task_id not in seen_ids]
+        if stale_ids:
+            ClickUpTask.query.filter(ClickUpTask.id.in_(stale_ids)).delete(synchronize_session=False)
+        state.full_synced_at = now
+
+    state.cursor = str(started_ms)
+    state.synced_at = now
+    db.session.add(state)
+    db.session.commit()
+
+    logger.info("ClickUp %s sync wrote %s tasks", 'full' if full else 'incremental', written)
+    return written
+
+
+def get_local_tasks(start_date=None, end_date=None, include_closed=True):
+    """Get mirrored task payloads with a due date in the given range, ordered by due date."""
+    query = ClickUpTask.query.filter(ClickUpTask.due_date.isnot(None))
+    if start_date:
+        query = query.filter(ClickUpTask.due_date >= int(start_date.timestamp() * 1000))
+    if end_date:
+        query = query.filter(ClickUpTask.due_date <= int(end_date.timestamp() * 1000))
+    if not include_closed:
+        query = query.filter(ClickUpTask.closed.is_(False))
+    return [json.loads(data) for (data,) in query.order_by(ClickUpTask.due_date).with_entities(ClickUpTask.data)]
+
+
+def get_last_synced():
+    """ISO timestamp (UTC) of the last successful sync, or None if never synced."""
+    state = db.session.get(SyncState, SYNC_SOURCE)
+    if not state or not state.synced_at:
+        return None
+    return state.synced_at.isoformat() + 'Z'
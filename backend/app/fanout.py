@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Shared pool so a slow source that overruns its deadline keeps running in the
+# background without holding up the request that started it.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='fanout')
+
+# Last successful result per (namespace, section), served (marked stale) when
+# a source times out or fails.
+_last_good = {}
+_last_good_lock = threading.Lock()
+
+
+def _remember(key):
+    """Build a done-callback that stores a successful result as the last good value."""
+    def callback(future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        with _last_good_lock:
+            _last_good[key] = future.result()
+    return callback
+
+
+def _fallback(key, timed_out, error=None):
+    with _last_good_lock:
+        has_previous = key in _last_good
+        data = _last_good.get(key)
+    return {
+        'data': data,
+        'stale': has_previous,
+        'timed_out': timed_out,
+        'error': error
+    }
+
+
+def _in_app_context(app, fetch):
+    def run():
+        with app.app_context():
+            return fetch()
+    return run
+
+
+def run_fanout(sources, budget, app=None, namespace=None):
+    """Run several source fetches in parallel and collect what finishes in time.
+
+    ``sources`` maps a section name to a ``(fetch, deadline)`` pair, where
+    ``fetch`` is a zero-argument callable and ``deadline`` is the number of
+    seconds that source is allowed to take. No source is waited on past the
+    overall ``budget``.
+
+    Returns a dict keyed by section name. Each entry has ``data`` plus the
+    ``stale``, ``timed_out`` and ``error`` markers. A source that times out or
+    raises falls back to its last good result (``stale`` is True) or to
+    ``None`` if it has never succeeded.
+
+    If ``app`` is given, each fetch runs inside its application context so it
+    can use the database. Last good results are kept per ``namespace``, so
+    callers that reuse a section name for differently shaped data never fall
+    back to each other's results.
+    """
+    started = time.monotonic()
+    futures = {}
+    for name, (fetch, _) in sources.items():
+        if app is not None:
+            fetch = _in_app_context(app, fetch)
+        future = _executor.submit(fetch)
+        future.add_done_callback(_remember((namespace, name)))
+        futures[name] = future
+
+    results = {}
+    for name, (_, deadline) in sorted(sources.items(), key=lambda item: item[1][1]):
+        remaining = started + min(deadline, budget) - time.monotonic()
+        try:
+            data = futures[name].result(timeout=max(remaining, 0))
+            results[name] = {'data': data, 'stale': False, 'timed_out': False, 'error': None}
+        except TimeoutError:
+            logger.warning("Source '%s' missed its %.1fs deadline", name, min(deadline, budget))
+            results[name] = _fallback((namespace, name), timed_out=True)
+        except Exception as e:
+            logger.error("Error getting %s data: %s", name, e)
+            results[name] = _fallback((namespace, name), timed_out=False, error=str(e))
+
+    logger.info("Fan-out finished in %.2fs", time.monotonic() - started)
+    return results
@@ -0,0 +1,322 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Blueprint, current_app, jsonify, request, send_file, url_for
+from PIL import Image as PILImage
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
+from werkzeug.utils import secure_filename
+from .models import db, Image, Reflection
+
+logger = logging.getLogger(__name__)
+
+# Create Blueprint
+images_bp = Blueprint('images', __name__, url_prefix='/api/images')
+
+# Largest upload body accepted, in bytes
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv('IMAGE_MAX_UPLOAD_BYTES', 50 * 1024 * 1024))
+
+# Longest edge in pixels of each precomputed variant; 'full' is the original
+VARIANT_SIZES = {
+    'thumb': 256,
+    'medium': 1024
+}
+VARIANT_QUALITY = 85
+
+# Formats Pillow may identify an upload as, and the content type each is stored with
+ALLOWED_FORMATS = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp'
+}
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# A digest URL always names the same bytes, so browsers may keep it for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Resizing runs in separate processes so decoding large photos never blocks
+# a request worker. 'spawn' avoids forking a process that has threads running.
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def storage_root(app=None):
+    """Directory holding originals and variants, IMAGE_STORAGE_PATH or ``<instance>/images``."""
+    app = app or current_app
+    return os.getenv('IMAGE_STORAGE_PATH') or os.path.join(app.instance_path, 'images')
+
+
+def original_path(root, digest):
+    return os.path.join(root, 'originals', digest[:2], digest)
+
+
+def variant_path(root, digest, size):
+    return os.path.join(root, 'variants', size, digest[:2], digest + '.jpg')
+
+
+class HashingFile:
+    """Temporary file that hashes and counts everything written to it.
+
+    Used as werkzeug's stream_factory, so upload parts go straight to disk in
+    chunks and the digest is known as soon as the part ends.
+    """
+
+    def __init__(self, directory):
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-', delete=False)
+        self.name = self._file.name
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def render_variants(source, targets):
+    """Write resized JPEG variants of ``source``; ``targets`` maps paths to edge lengths.
+
+    Runs in the image process pool, so it imports Pillow itself.
+    """
+    from PIL import Image as PILImage, ImageOps
+
+    with PILImage.open(source) as original:
+        original = ImageOps.exif_transpose(original).convert('RGB')
+        for path, edge in targets.items():
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            variant = original.copy()
+            variant.thumbnail((edge, edge))
+            tmp_path = path + '.tmp'
+            variant.save(tmp_path, 'JPEG', quality=VARIANT_QUALITY, optimize=True)
+            os.replace(tmp_path, path)
+
+
+def detect_content_type(path):
+    """Content type of the image at ``path`` as identified by Pillow.
+
+    Returns None unless the file decodes as one of ALLOWED_FORMATS, so
+    anything else labelled ``image/*`` by the client (SVG, HTML) is refused.
+    """
+    try:
+        with PILImage.open(path, formats=list(ALLOWED_FORMATS)) as image:
+            image.verify()
+            return ALLOWED_FORMATS.get(image.format)
+    except Exception:
+        # Unidentified, truncated or oversized (decompression bomb) images
+        return None
+
+
+def _log_render_result(digest):
+    def callback(future):
+        if future.exception() is not None:
+            logger.error("Error rendering variants for %s: %s", digest, future.exception())
+    return callback
+
+
+def schedule_variants(root, digest):
+    """Queue thumbnail/medium rendering for an original; returns immediately.
+
+    Never raises: if the pool can't take the job the failure is logged and
+    the variants are queued again the next time one is requested.
+    """
+    targets = {variant_path(root, digest, size): edge for size, edge in VARIANT_SIZES.items()}
+    if all(os.path.exists(path) for path in targets):
+        return
+    global _pool
+    try:
+        try:
+            future = _get_pool().submit(render_variants, original_path(root, digest), targets)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool
+            _pool = None
+            future = _get_pool().submit(render_variants, original_path(root, digest), targets)
+    except Exception as e:
+        logger.error("Error queueing variants for %s: %s", digest, e)
+        return
+    future.add_done_callback(_log_render_result(digest))
+
+
+def _store(root, upload):
+    """Move a finished upload into content-addressed storage.
+
+    Returns the digest and whether identical content was already stored.
+    """
+    digest = upload.stream.sha256.hexdigest()
+    upload.stream.close()
+    path = original_path(root, digest)
+    if os.path.exists(path):
+        os.unlink(upload.stream.name)
+        return digest, True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(upload.stream.name, path)
+    return digest, False
+
+
+def image_urls(digest):
+    """URLs for each size of a stored image, or None for rows stored before hashing."""
+    if not digest:
+        return None
+    return {size: url_for('images.get_image', digest=digest, size=size) for size in (*VARIANT_SIZES, 'full')}
+
+
+def _serialize(image, duplicate):
+    return {
+        'id': image.id,
+        'sha256': image.sha256,
+        'urls': image_urls(image.sha256),
+        'filename': image.filename,
+        'size': image.size,
+        'content_type': image.content_type,
+        'reflection_id': image.reflection_id,
+        'duplicate': duplicate
+    }
+
+
+@images_bp.route('', methods=['POST'])
+def upload_images():
+    """Store uploaded images (multipart field ``file``, repeatable).
+
+    The body is streamed to disk while it is hashed; identical content is kept
+    once, and an optional ``reflection_id`` form field attaches the images.
+    Each file must decode with Pillow as JPEG, PNG, GIF or WebP, and the
+    detected type is what gets stored.
+    Thumbnails are rendered in the background.
+    """
+    root = storage_root()
+    tmp_dir = os.path.join(root, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    spooled = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        spooled.append(HashingFile(tmp_dir))
+        return spooled[-1]
+
+    try:
+        try:
+            _, form, files = parse_form_data(
+                request.environ,
+                stream_factory=stream_factory,
+                max_content_length=IMAGE_MAX_UPLOAD_BYTES,
+                silent=False
+            )
+        except RequestEntityTooLarge:
+            return jsonify({'error': f'Upload exceeds {IMAGE_MAX_UPLOAD_BYTES} bytes'}), 413
+        except ValueError as e:
+            return jsonify({'error': f'Invalid multipart body: {e}'}), 400
+
+        uploads = files.getlist('file')
+        if not uploads:
+            return jsonify({'error': "No files in field 'file'"}), 400
+
+        reflection_id = form.get('reflection_id', type=int)
+        if reflection_id is not None and db.session.get(Reflection, reflection_id) is None:
+            return jsonify({'error': 'Reflection not found'}), 404
+
+        # The client's Content-Type is ignored; the bytes decide
+        content_types = []
+        for upload in uploads:
+            upload.stream.flush()
+            content_types.append(detect_content_type(upload.stream.name))
+        rejected = [upload.filename for upload, content_type in zip(uploads, content_types) if content_type is None]
+        if rejected:
+            return jsonify({'error': f"Not a JPEG, PNG, GIF or WebP image: {', '.join(rejected)}"}), 415
+
+        results = []
+        for upload, content_type in zip(uploads, content_types):
+            digest, duplicate = _store(root, upload)
+            image = Image.query.filter_by(sha256=digest, reflection_id=reflection_id).first()
+            if image is None:
+                image = Image(
+                    filename=secure_filename(upload.filename or '') or digest,
+                    path=os.path.relpath(original_path(root, digest), root),
+                    reflection_id=reflection_id,
+                    sha256=digest,
+                    size=upload.stream.size,
+                    content_type=content_type
+                )
+                db.session.add(image)
+            else:
+                duplicate = True
+            results.append((image, duplicate, digest))
+        db.session.commit()
+    finally:
+        # Anything not moved into storage: rejected, failed or unused parts
+        for spool in spooled:
+            spool.close()
+            if os.path.exists(spool.name):
+                os.unlink(spool.name)
+
+    for digest in {digest for _, _, digest in results}:
+        schedule_variants(root, digest)
+    logger.info("Stored %d uploaded images (%d duplicates)", len(results), sum(1 for _, duplicate, _ in results if duplicate))
+    return jsonify([_serialize(image, duplicate) for image, duplicate, _ in results]), 201
+
+
+@images_bp.route('/<digest>', methods=['GET'])
+def get_image(digest):
+    """Serve an image by content digest, ``?size=thumb|medium|full`` (default full).
+
+    Files go out through send_file, so the server can use sendfile, and the
+    digest doubles as a strong ETag for If-None-Match and Range requests. A
+    variant that hasn't been rendered yet is queued and the original is
+    served meanwhile, without long-lived caching. Only ALLOWED_FORMATS types
+    are served inline; anything else stored before uploads were checked goes
+    out as an octet-stream attachment, and nothing may be content-sniffed.
+    """
+    size = request.args.get('size', 'full')
+    if size != 'full' and size not in VARIANT_SIZES:
+        return jsonify({'error': f"Unknown size '{size}'"}), 400
+    if not DIGEST_PATTERN.match(digest):
+        return jsonify({'error': 'Image not found'}), 404
+
+    root = storage_root()
+    content_type = db.session.execute(
+        db.select(Image.content_type).where(Image.sha256 == digest).limit(1)
+    ).scalar()
+    path = original_path(root, digest)
+    if content_type is None or not os.path.exists(path):
+        return jsonify({'error': 'Image not found'}), 404
+
+    max_age = IMMUTABLE_MAX_AGE
+    if size != 'full':
+        rendered = variant_path(root, digest, size)
+        if os.path.exists(rendered):
+            path, content_type = rendered, 'image/jpeg'
+        else:
+            schedule_variants(root, digest)
+            size, max_age = 'full', 0
+
+    inline = content_type in ALLOWED_FORMATS.values()
+    response = send_file(
+        path,
+        mimetype=content_type if inline else 'application/octet-stream',
+        as_attachment=not inline,
+        download_name=digest,
+        conditional=True,
+        etag=f'{digest}-{size}',
+        max_age=max_age
+    )
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    if max_age:
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,95 @@
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# db.create_all() builds new tables with the current schema but never alters
+# existing ones. Each step below brings an older database up to date and is
+# written so it is also a no-op on a freshly created one. The number of steps
+# applied is kept in SQLite's PRAGMA user_version.
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(text(f'PRAGMA table_info({table})'))}
+
+
+def add_reflection_day(conn):
+    """Store each reflection's local day and index it with the type."""
+    if 'day' not in _columns(conn, 'reflection'):
+        conn.execute(text('ALTER TABLE reflection ADD COLUMN day DATE'))
+    conn.execute(text("UPDATE reflection SET day = date(date, 'localtime') WHERE day IS NULL AND date IS NOT NULL"))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_reflection_day_type ON reflection (day, type)'))
+
+
+def index_image_reflection_id(conn):
+    """Let image lookups by reflection (eager loading) use an index."""
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_image_reflection_id ON image (reflection_id)'))
+
+
+def add_image_content_columns(conn):
+    """Columns for content-addressed image storage."""
+    columns = _columns(conn, 'image')
+    for name, type_ in (('sha256', 'VARCHAR(64)'), ('size', 'INTEGER'), ('content_type', 'VARCHAR(64)')):
+        if name not in columns:
+            conn.execute(text(f'ALTER TABLE image ADD COLUMN {name} {type_}'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_image_sha256 ON image (sha256)'))
+
+
+REFLECTION_FTS_COLUMNS = ('priorities', 'intention', 'reflection', 'challenges', 'tomorrow')
+
+
+def add_reflection_search(conn):
+    """External-content FTS5 index over the reflection text, kept in sync by triggers."""
+    columns = ', '.join(REFLECTION_FTS_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in REFLECTION_FTS_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in REFLECTION_FTS_COLUMNS)
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS reflection_fts USING fts5("
+        f"{columns}, content='reflection', content_rowid='id', tokenize='porter unicode61')"
+    ))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS reflection_fts_insert AFTER INSERT ON reflection BEGIN
+            INSERT INTO reflection_fts(rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS reflection_fts_delete AFTER DELETE ON reflection BEGIN
+            INSERT INTO reflection_fts(reflection_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS reflection_fts_update AFTER UPDATE OF {columns} ON reflection BEGIN
+            INSERT INTO reflection_fts(reflection_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO reflection_fts(rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    """))
+    # Index the rows written before the table existed
+    conn.execute(text("INSERT INTO reflection_fts(reflection_fts) VALUES ('rebuild')"))
+
+
+def backfill_reflection_stats(conn):
+    """Fill the day/week aggregate tables from existing reflections."""
+    from .analytics import rebuild_stats
+    rebuild_stats(conn)
+
+
+# Append only; never reorder or remove a step once it has shipped
+MIGRATIONS = [
+    add_reflection_day,
+    index_image_reflection_id,
+    add_image_content_columns,
+    add_reflection_search,
+    backfill_reflection_stats,
+]
+
+
+def run_migrations(engine):
+    """Apply every step newer than the database's user_version, in one transaction each."""
+    with engine.begin() as conn:
+        version = conn.execute(text('PRAGMA user_version')).scalar()
+
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(text(f'PRAGMA user_version = {number}'))
+        logger.info("Applied migration %d: %s", number, step.__name__)
@@ -1,10 +1,15 @@
 from . import db
-from datetime import datetime
+from datetime import datetime, timezone
+
+def local_day(utc_datetime):
+    """The local calendar day of a naive UTC datetime."""
+    return utc_datetime.replace(tzinfo=timezone.utc).astimezone().date()
 
 class Reflection(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(10))  # 'morning' or 'evening'
     date = db.Column(db.DateTime, default=datetime.utcnow)
+    day = db.Column(db.Date)  # local day of ``date``, for indexed lookups
     priorities = db.Column(db.Text)
     intention = db.Column(db.Text)
     reflection = db.Column(db.Text)
@@ -12,9 +17,76 @@ class Reflection(db.Model):
     tomorrow = db.Column(db.Text)
     images = db.relationship('Image', backref='reflection', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_reflection_day_type', 'day', 'type'),
+    )
+
 class Image(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255))
     path = db.Column(db.String(255))
-    reflection_id = db.Column(db.Integer, db.ForeignKey('reflection.id'))
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    reflection_id = db.Column(db.Integer, db.ForeignKey('reflection.id'), index=True)
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sha256 = db.Column(db.String(64), index=True)  # content digest, also the storage key
+    size = db.Column(db.Integer)  # bytes
+    content_type = db.Column(db.String(64))
+
+class ReflectionDayStats(db.Model):
+    """Reflection counts for one local day, maintained by analytics."""
+    day = db.Column(db.Date, primary_key=True)
+    entries = db.Column(db.Integer, default=0)
+    morning = db.Column(db.Integer, default=0)
+    evening = db.Column(db.Integer, default=0)
+    words = db.Column(db.Integer, default=0)
+    streak = db.Column(db.Integer, default=0)  # consecutive journaled days ending here
+
+class ReflectionWeekStats(db.Model):
+    """Reflection counts for one Monday-based week, maintained by analytics."""
+    week_start = db.Column(db.Date, primary_key=True)
+    entries = db.Column(db.Integer, default=0)
+    morning = db.Column(db.Integer, default=0)
+    evening = db.Column(db.Integer, default=0)
+    words = db.Column(db.Integer, default=0)
+    days = db.Column(db.Integer, default=0)  # days with at least one entry
+
+class ClickUpTask(db.Model):
+    """Local mirror of a ClickUp task, kept current by clickup_sync."""
+    id = db.Column(db.String(32), primary_key=True)  # ClickUp task ID
+    name = db.Column(db.Text)
+    status = db.Column(db.String(64))
+    closed = db.Column(db.Boolean, default=False)
+    priority = db.Column(db.String(16))
+    due_date = db.Column(db.BigInteger, index=True)  # ms since epoch, as ClickUp sends it
+    date_updated = db.Column(db.BigInteger)  # ms since epoch
+    list_id = db.Column(db.String(32), index=True)
+    url = db.Column(db.String(255))
+    data = db.Column(db.Text)  # full task JSON as returned by the API
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SyncState(db.Model):
+    """Progress marker for an incremental sync, one row per source."""
+    source = db.Column(db.String(64), primary_key=True)
+    cursor = db.Column(db.Text)  # source-specific resume point
+    synced_at = db.Column(db.DateTime)
+    full_synced_at = db.Column(db.DateTime)
+
+class CalendarEvent(db.Model):
+    """Local copy of a Google Calendar event, kept current by calendar_sync."""
+    calendar_id = db.Column(db.String(255), primary_key=True)
+    event_id = db.Column(db.String(255), primary_key=True)
+    calendar_name = db.Column(db.String(255))
+    title = db.Column(db.Text)
+    description = db.Column(db.Text)
+    location = db.Column(db.Text)
+    attendees = db.Column(db.Text)  # JSON list of attendee emails
+    html_link = db.Column(db.String(512))
+    status = db.Column(db.String(32))
+    start_time = db.Column(db.String(64))  # as sent by the API (dateTime or all-day date)
+    end_time = db.Column(db.String(64))
+    start_utc = db.Column(db.DateTime)  # naive UTC, for range queries
+    end_utc = db.Column(db.DateTime)
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_calendar_event_start_end', 'start_utc', 'end_utc'),
+    )
@@ -1,12 +1,18 @@
 import logging
 from datetime import datetime, timedelta
-from flask import Blueprint, jsonify, request
-from .models import db, Reflection, Image
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import text
+from sqlalchemy.orm import load_only, selectinload
+from .models import db, Reflection, Image, local_day
 from .things_integration import ThingsDB
+from .fanout import run_fanout
+from .cache import integration_cache
+from .images import image_urls
+from .analytics import get_stats, record_reflection
+from .transfer import InvalidImportLine, export_lines, import_lines
+from .logging_utils import summarize
 import os
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create Blueprint
@@ -19,8 +25,11 @@ def test_server():
 @main_bp.route('/reflection', methods=['POST'])
 def create_reflection():
     data = request.json
+    now = datetime.utcnow()
     reflection = Reflection(
         type=data.get('type'),
+        date=now,
+        day=local_day(now),
         priorities=data.get('priorities'),
         intention=data.get('intention'),
         reflection=data.get('reflection'),
@@ -28,6 +37,7 @@ def create_reflection():
         tomorrow=data.get('tomorrow')
     )
     db.session.add(reflection)
+    record_reflection(db.session, reflection)
     db.session.commit()
     return jsonify({'id': reflection.id}), 201
 
@@ -35,8 +45,10 @@ def create_reflection():
 def get_reflection(date, type):
     try:
         date_obj = datetime.strptime(date, '%Y-%m-%d')
-        reflection = Reflection.query.filter(
-            db.func.date(Reflection.date) == date_obj.date(),
+        reflection = Reflection.query.options(
+            selectinload(Reflection.images).options(load_only(Image.id, Image.path, Image.sha256))
+        ).filter(
+            Reflection.day == date_obj.date(),
             Reflection.type == type
         ).first()
         
@@ -51,33 +63,183 @@ def get_reflection(date, type):
             'reflection': reflection.reflection,
             'challenges': reflection.challenges,
             'tomorrow': reflection.tomorrow,
-            'images': [{'id': img.id, 'path': img.path} for img in reflection.images]
+            'images': [{'id': img.id, 'path': img.path, 'urls': image_urls(img.sha256)} for img in reflection.images]
         })
     except ValueError:
         return jsonify({'error': 'Invalid date format'}), 400
 
+# Columns the weekly summary returns; only these are selected
+WEEKLY_SUMMARY_COLUMNS = (
+    Reflection.id,
+    Reflection.day,
+    Reflection.type,
+    Reflection.priorities,
+    Reflection.reflection
+)
+
 @main_bp.route('/reflection/weekly', methods=['GET'])
 def get_weekly_summary():
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=7)
+    # The last seven local days, today included
+    end_day = local_day(datetime.utcnow())
+    start_day = end_day - timedelta(days=6)
     
-    reflections = Reflection.query.filter(
-        Reflection.date.between(start_date, end_date)
-    ).all()
+    rows = db.session.execute(
+        db.select(*WEEKLY_SUMMARY_COLUMNS)
+        .where(Reflection.day.between(start_day, end_day))
+        .order_by(Reflection.day, Reflection.type)
+    )
     
     return jsonify([{
         'id': r.id,
-        'date': r.date.strftime('%Y-%m-%d'),
+        'date': r.day.isoformat(),
         'type': r.type,
         'priorities': r.priorities,
         'reflection': r.reflection
-    } for r in reflections]) 
+    } for r in rows])
+
+# Search results per page: default and upper bound
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+def _fts_query(query):
+    """Turn free text into an FTS5 query: every word must match, ``word*`` matches a prefix.
+
+    Words are quoted so FTS5 operators and punctuation in user input can't
+    cause syntax errors.
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+@main_bp.route('/reflection/search', methods=['GET'])
+def search_reflections():
+    """Full-text search over reflections, best matches first.
+
+    Query parameters: ``q`` (required), ``type``, ``from``/``to`` (YYYY-MM-DD,
+    inclusive), ``page`` and ``per_page``. Each result carries a highlighted
+    snippet from the best-matching field.
+    """
+    match = _fts_query(request.args.get('q', ''))
+    if not match:
+        return jsonify({'error': "Query parameter 'q' is required"}), 400
+
+    page = max(request.args.get('page', default=1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', default=SEARCH_PAGE_SIZE, type=int), 1), SEARCH_MAX_PAGE_SIZE)
+
+    filters = ['reflection_fts MATCH :match']
+    params = {'match': match, 'limit': per_page + 1, 'offset': (page - 1) * per_page}
+    try:
+        for arg, condition in (('from', 'r.day >= :from_day'), ('to', 'r.day <= :to_day')):
+            if request.args.get(arg):
+                params[arg + '_day'] = datetime.strptime(request.args[arg], '%Y-%m-%d').date().isoformat()
+                filters.append(condition)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    if request.args.get('type'):
+        params['type'] = request.args['type']
+        filters.append('r.type = :type')
+
+    rows = db.session.execute(text(f"""
+        SELECT r.id, r.type, r.day,
+               snippet(reflection_fts, -1, '<mark>', '</mark>', '…', 12) AS snippet,
+               bm25(reflection_fts) AS score
+        FROM reflection_fts
+        JOIN reflection r ON r.id = reflection_fts.rowid
+        WHERE {' AND '.join(filters)}
+        ORDER BY score
+        LIMIT :limit OFFSET :offset
+    """), params).all()
+
+    return jsonify({
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(rows) > per_page,
+        'results': [{
+            'id': row.id,
+            'type': row.type,
+            'date': row.day,
+            'snippet': row.snippet,
+            'score': row.score
+        } for row in rows[:per_page]]
+    })
+
+# Default window for /reflection/stats, in days ending today
+STATS_DEFAULT_DAYS = 30
+
+@main_bp.route('/reflection/stats', methods=['GET'])
+def get_reflection_stats():
+    """Journaling streaks, morning/evening completion rates and weekly word counts.
+
+    ``from``/``to`` (YYYY-MM-DD, inclusive) default to the last 30 days. Served
+    from the per-day and per-week aggregates, so cost grows with the range,
+    not with the history.
+    """
+    try:
+        today = local_day(datetime.utcnow())
+        last_day = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else today
+        first_day = (datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from')
+                     else last_day - timedelta(days=STATS_DEFAULT_DAYS - 1))
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    if first_day > last_day:
+        return jsonify({'error': "'from' must not be after 'to'"}), 400
+
+    return jsonify(get_stats(db.session, first_day, last_day))
+
+@main_bp.route('/reflection/export', methods=['GET'])
+def export_reflections():
+    """Stream reflections and their image metadata as NDJSON, one reflection per line.
+
+    Optional ``from``/``to`` (YYYY-MM-DD, inclusive) limit the days exported.
+    """
+    try:
+        first_day = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+        last_day = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+
+    return Response(
+        stream_with_context(export_lines(first_day, last_day)),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=reflections.ndjson'}
+    )
+
+@main_bp.route('/reflection/import', methods=['POST'])
+def import_reflections():
+    """Bulk-import NDJSON in the export format, read from the request body line by line.
+
+    Records keep their ``id`` when it is free and are skipped when it is
+    taken, so re-importing an export is harmless. Records without an ``id``
+    get a new one. A bad line gives a 400 with the counts already committed
+    and the last line they cover.
+    """
+    try:
+        return jsonify(import_lines(request.stream)), 201
+    except InvalidImportLine as e:
+        # Earlier batches are already committed; say how far, so a retry can
+        # resume after committed['last_line'] instead of duplicating them
+        return jsonify({'error': f'Invalid import data at {e}', 'line': e.line, 'committed': e.committed}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Error importing reflections: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@main_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Hit/miss counters for the integration cache"""
+    return jsonify(integration_cache.stats())
 
 @main_bp.route('/tasks/today', methods=['GET'])
 def get_today_tasks():
     things = ThingsDB()
     try:
         tasks = things.get_today_tasks()
+        areas = tasks.get('areas', {})
+        summarize(status=tasks.get('status'), areas=len(areas), tasks=sum(len(area) for area in areas.values()))
         return jsonify(tasks)
     except FileNotFoundError as e:
         return jsonify({'error': str(e)}), 404
@@ -96,6 +258,24 @@ def get_upcoming_tasks():
     except Exception as e:
         return jsonify({'error': f'Error accessing Things 3: {str(e)}'}), 500 
 
+@main_bp.route('/tasks/area/<area>', methods=['GET'])
+def get_area_tasks(area):
+    things = ThingsDB()
+    try:
+        tasks = things.get_area_tasks(area)
+        return jsonify(tasks)
+    except Exception as e:
+        return jsonify({'error': f'Error accessing Things 3: {str(e)}'}), 500 
+
+@main_bp.route('/tasks/project/<project>', methods=['GET'])
+def get_project_tasks(project):
+    things = ThingsDB()
+    try:
+        tasks = things.get_project_tasks(project)
+        return jsonify(tasks)
+    except Exception as e:
+        return jsonify({'error': f'Error accessing Things 3: {str(e)}'}), 500
+
 @main_bp.route('/tasks/test', methods=['GET'])
 def test_things_connection():
     things = ThingsDB()
@@ -118,126 +298,151 @@ def get_yesterday_tasks():
     except Exception as e:
         return jsonify({'error': f'Error accessing Things 3: {str(e)}'}), 500 
 
-@main_bp.route('/overview/ceo', methods=['GET'])
-def get_ceo_overview():
-    """Get a high-level overview of tasks, events, and weather for CEO-level insights"""
-    try:
-        overview = {
-            'attention_needed': {'count': 0, 'items': []},
-            'high_priority': {'count': 0, 'items': []},
-            'productivity': {'completed_yesterday': 0, 'planned_today': 0},
-            'upcoming_meetings': {'count': 0, 'items': []},
-            'weather': None
+# Per-source deadlines (seconds) for the CEO overview fan-out
+CEO_OVERVIEW_DEADLINES = {
+    'weather': 4.0,
+    'clickup': 8.0,
+    'things': 3.0,
+    'calendar': 6.0
+}
+CEO_OVERVIEW_BUDGET = 8.0
+
+def _overview_weather():
+    from .weather_integration import WeatherClient
+    weather = WeatherClient()
+    return weather.get_weather()
+
+def _overview_clickup(today):
+    from .clickup_sync import get_local_tasks
+    start_date = today - timedelta(days=1)  # Yesterday
+    end_date = today + timedelta(days=7)    # Week ahead
+    clickup_tasks = get_local_tasks(start_date, end_date, include_closed=False)
+
+    # Process ClickUp tasks for attention needed
+    attention_needed = []
+    high_priority_tasks = []
+    for task in clickup_tasks:
+        # Check for high priority tasks
+        if task.get('priority') in ['urgent', 'high']:
+            high_priority_tasks.append({
+                'title': task['name'],
+                'due_date': task['due_date'],
+                'status': task['status'],
+                'url': task['url']
+            })
+
+        # Check for tasks needing attention (overdue or blocked)
+        if (task.get('status') == 'blocked' or
+            (task.get('due_date') and task['due_date'] < today.isoformat())):
+            attention_needed.append({
+                'title': task['name'],
+                'reason': 'overdue' if task.get('due_date') else 'blocked',
+                'status': task['status'],
+                'url': task['url']
+            })
+
+    return {
+        'attention_needed': {
+            'count': len(attention_needed),
+            'items': attention_needed
+        },
+        'high_priority': {
+            'count': len(high_priority_tasks),
+            'items': high_priority_tasks
         }
+    }
 
-        # Get Weather information
-        try:
-            from .weather_integration import WeatherClient
-            weather = WeatherClient()
-            overview['weather'] = weather.get_weather()
-            logger.info("Weather data retrieved successfully")
-        except Exception as e:
-            logger.error(f"Error getting weather data: {str(e)}")
-
-        # Get ClickUp tasks
-        try:
-            from .clickup_integration import ClickUpClient
-            clickup = ClickUpClient()
-            today = datetime.now()
-            start_date = today - timedelta(days=1)  # Yesterday
-            end_date = today + timedelta(days=7)    # Week ahead
-            clickup_tasks = clickup.get_tasks(start_date, end_date)
-
-            # Process ClickUp tasks for attention needed
-            attention_needed = []
-            high_priority_tasks = []
-            for task in clickup_tasks:
-                # Check for high priority tasks
-                if task.get('priority') in ['urgent', 'high']:
-                    high_priority_tasks.append({
-                        'title': task['name'],
-                        'due_date': task['due_date'],
-                        'status': task['status'],
-                        'url': task['url']
-                    })
-                
-                # Check for tasks needing attention (overdue or blocked)
-                if (task.get('status') == 'blocked' or 
-                    (task.get('due_date') and task['due_date'] < today.isoformat())):
-                    attention_needed.append({
-                        'title': task['name'],
-                        'reason': 'overdue' if task.get('due_date') else 'blocked',
-                        'status': task['status'],
-                        'url': task['url']
-                    })
-
-            overview['attention_needed'] = {
-                'count': len(attention_needed),
-                'items': attention_needed
-            }
-            overview['high_priority'] = {
-                'count': len(high_priority_tasks),
-                'items': high_priority_tasks
-            }
-            logger.info("ClickUp tasks retrieved successfully")
-        except Exception as e:
-            logger.error(f"Error getting ClickUp data: {str(e)}")
-
-        # Get Things tasks
-        try:
-            things = ThingsDB()
-            today_tasks = things.get_today_tasks()
-            yesterday_completed = things.get_yesterday_completed_tasks()
-
-            # Calculate productivity metrics
-            tasks_completed_yesterday = len(yesterday_completed.get('projects', []))
-            tasks_planned_today = sum(len(area) for area in today_tasks.get('areas', {}).values())
-            
-            overview['productivity'] = {
-                'completed_yesterday': tasks_completed_yesterday,
-                'planned_today': tasks_planned_today
+def _overview_things():
+    things = ThingsDB()
+    today_tasks = things.get_today_tasks()
+    yesterday_completed = things.get_yesterday_completed_tasks()
+    for result in (today_tasks, yesterday_completed):
+        # ThingsDB reports failures in the result; raise so the fan-out
+        # falls back to the last good numbers and flags the section
+        if isinstance(result, dict) and result.get('status') == 'error':
+            raise RuntimeError(result['error'])
+
+    # Calculate productivity metrics
+    tasks_completed_yesterday = len(yesterday_completed.get('projects', []))
+    tasks_planned_today = sum(len(area) for area in today_tasks.get('areas', {}).values())
+
+    return {
+        'completed_yesterday': tasks_completed_yesterday,
+        'planned_today': tasks_planned_today
+    }
+
+def _overview_calendar(today):
+    from .calendar_sync import get_local_events
+    calendar_events = get_local_events(
+        start_date=today - timedelta(days=1),
+        end_date=today + timedelta(days=7)
+    )
+
+    upcoming_meetings = []
+    for event in calendar_events:
+        upcoming_meetings.append({
+            'title': event['title'],
+            'start_time': event['start_time'],
+            'end_time': event['end_time'],
+            'attendees': event.get('attendees', [])
+        })
+
+    return {
+        'count': len(upcoming_meetings),
+        'items': upcoming_meetings
+    }
+
+def build_ceo_overview(app):
+    """Fetch the four overview sources in parallel and assemble the CEO overview.
+
+    Any section that misses its deadline or fails is served from its last good
+    result and flagged in ``overview['sections']``.
+    """
+    today = datetime.now()
+    results = run_fanout({
+        'weather': (_overview_weather, CEO_OVERVIEW_DEADLINES['weather']),
+        'clickup': (lambda: _overview_clickup(today), CEO_OVERVIEW_DEADLINES['clickup']),
+        'things': (_overview_things, CEO_OVERVIEW_DEADLINES['things']),
+        'calendar': (lambda: _overview_calendar(today), CEO_OVERVIEW_DEADLINES['calendar'])
+    }, budget=CEO_OVERVIEW_BUDGET, app=app, namespace='overview')
+
+    clickup = results['clickup']['data'] or {}
+    return {
+        'attention_needed': clickup.get('attention_needed', {'count': 0, 'items': []}),
+        'high_priority': clickup.get('high_priority', {'count': 0, 'items': []}),
+        'productivity': results['things']['data'] or {'completed_yesterday': 0, 'planned_today': 0},
+        'upcoming_meetings': results['calendar']['data'] or {'count': 0, 'items': []},
+        'weather': results['weather']['data'],
+        'sections': {
+            name: {
+                'stale': result['stale'],
+                'timed_out': result['timed_out'],
+                'error': result['error']
             }
-            logger.info("Things data retrieved successfully")
-        except Exception as e:
-            logger.error(f"Error getting Things data: {str(e)}")
-
-        # Get Calendar events if available
-        try:
-            try:
-                from .calendar_integration import get_calendar_client
-                calendar = get_calendar_client()
-                calendar_events = calendar.get_events(
-                    start_date=today - timedelta(days=1),
-                    end_date=today + timedelta(days=7)
-                )
-
-                upcoming_meetings = []
-                for event in calendar_events:
-                    upcoming_meetings.append({
-                        'title': event['title'],
-                        'start_time': event['start_time'],
-                        'end_time': event['end_time'],
-                        'attendees': event.get('attendees', [])
-                    })
-
-                overview['upcoming_meetings'] = {
-                    'count': len(upcoming_meetings),
-                    'items': upcoming_meetings
-                }
-                logger.info("Calendar events retrieved successfully")
-            except ImportError:
-                logger.warning("Calendar integration not available")
-        except Exception as e:
-            logger.error(f"Error getting calendar data: {str(e)}")
-        
+            for name, result in results.items()
+        }
+    }
+
+@main_bp.route('/overview/ceo', methods=['GET'])
+def get_ceo_overview():
+    """Get a high-level overview of tasks, events, and weather for CEO-level insights
+
+    The four sources are fetched in parallel, each with its own deadline; see
+    build_ceo_overview.
+    """
+    try:
+        overview = build_ceo_overview(current_app._get_current_object())
+        summarize(stale=','.join(name for name, section in overview['sections'].items() if section['stale']) or '-',
+                  failed=','.join(name for name, section in overview['sections'].items()
+                                  if section['error'] or section['timed_out']) or '-')
         return jsonify({
             'status': 'success',
             'overview': overview
         })
 
     except Exception as e:
-        logger.error(f"Error generating CEO overview: {str(e)}")
+        logger.error("Error generating CEO overview: %s", e)
         return jsonify({
             'status': 'error',
             'message': str(e)
-        }), 500 
\ No newline at end of file
+        }), 500
@@ -0,0 +1,280 @@
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import click
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every process runs its own scheduler
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Default cadences (seconds); each can be overridden with the named env var
+WEATHER_REFRESH_INTERVAL = int(os.getenv('WEATHER_REFRESH_INTERVAL', 600))
+CLICKUP_SYNC_INTERVAL = int(os.getenv('CLICKUP_SYNC_INTERVAL', 300))
+CALENDAR_SYNC_INTERVAL = int(os.getenv('CALENDAR_SYNC_INTERVAL', 300))
+THINGS_REFRESH_INTERVAL = int(os.getenv('THINGS_REFRESH_INTERVAL', 60))
+
+# Spread runs by up to this fraction of the interval so jobs don't line up
+DEFAULT_JITTER = 0.1
+
+# First retry after a failure waits min(interval, RETRY_BASE), doubling per
+# consecutive failure up to the job's max_backoff
+RETRY_BASE = 30.0
+
+# Longest the scheduler thread sleeps between checks
+MAX_IDLE = 5.0
+
+
+class Job:
+    """A periodic task plus its scheduling state."""
+
+    def __init__(self, name, func, interval, jitter=DEFAULT_JITTER, max_backoff=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff if max_backoff is not None else interval * 4
+        self.next_run = None
+        self.failures = 0
+        self.running = False
+        self.last_run = None
+        self.last_success = None
+        self.last_error = None
+
+
+class Scheduler:
+    """Runs jobs on fixed cadences with jitter, and backs off when they fail.
+
+    Time only comes in through ``run_pending(now)``, so tests can drive the
+    schedule with fake clocks and fake clients. Every job is due as soon as it
+    is added, which gives a refresh at boot. With an ``executor`` jobs run in
+    the background (a job is never started twice at once); without one they
+    run inline in ``run_pending``.
+    """
+
+    def __init__(self, executor=None, clock=time.monotonic, rng=None):
+        self.executor = executor
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, name, func, interval, **options):
+        job = Job(name, func, interval, **options)
+        job.next_run = self.clock()
+        self.jobs[name] = job
+        return job
+
+    def _delay(self, job):
+        if job.failures:
+            retry = min(job.interval, RETRY_BASE) * 2 ** (job.failures - 1)
+            return min(retry, job.max_backoff)
+        spread = job.interval * job.jitter
+        return job.interval + self.rng.uniform(-spread, spread)
+
+    def _run(self, job):
+        started = self.clock()
+        try:
+            job.func()
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.error("Scheduled job %s failed (%d in a row): %s", job.name, job.failures, e)
+        else:
+            job.failures = 0
+            job.last_error = None
+            job.last_success = started
+        finally:
+            with self._lock:
+                job.last_run = started
+                job.next_run = self.clock() + self._delay(job)
+                job.running = False
+            logger.debug("Scheduled job %s finished in %.2fs", job.name, self.clock() - started)
+
+    def run_pending(self, now=None):
+        """Start every job that is due at ``now`` and return their names."""
+        now = self.clock() if now is None else now
+        due = []
+        with self._lock:
+            for job in self.jobs.values():
+                if not job.running and job.next_run <= now:
+                    job.running = True
+                    due.append(job)
+        for job in due:
+            if self.executor is not None:
+                self.executor.submit(self._run, job)
+            else:
+                self._run(job)
+        return [job.name for job in due]
+
+    def seconds_until_next(self):
+        with self._lock:
+            pending = [job.next_run for job in self.jobs.values() if not job.running]
+        if not pending:
+            return MAX_IDLE
+        return min(max(min(pending) - self.clock(), 0), MAX_IDLE)
+
+    def start(self):
+        """Run the schedule on a daemon thread until stop() is called."""
+        def loop():
+            while not self._stop.is_set():
+                self.run_pending()
+                self._stop.wait(self.seconds_until_next())
+
+        self._thread = threading.Thread(target=loop, name='scheduler', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        """Per-job state, with times as seconds ago / from now."""
+        now = self.clock()
+        with self._lock:
+            return {
+                job.name: {
+                    'interval': job.interval,
+                    'running': job.running,
+                    'failures': job.failures,
+                    'last_error': job.last_error,
+                    'last_run_ago': round(now - job.last_run, 1) if job.last_run is not None else None,
+                    'last_success_ago': round(now - job.last_success, 1) if job.last_success is not None else None,
+                    'next_run_in': round(job.next_run - now, 1)
+                }
+                for job in self.jobs.values()
+            }
+
+
+def acquire_leader_lock(path):
+    """Take an exclusive, non-blocking flock on ``path``.
+
+    Returns the open lock file (keep it referenced for as long as the process
+    leads) or None if another process already holds the lock. The OS releases
+    it when the holder exits.
+    """
+    if fcntl is None:
+        return open(path, 'a')
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def _in_app_context(app, func):
+    def run():
+        with app.app_context():
+            try:
+                return func()
+            except Exception:
+                from .models import db
+                db.session.rollback()
+                raise
+    return run
+
+
+def _refresh_things(things):
+    for result in (things.get_today_tasks(), things.get_upcoming_tasks()):
+        # ThingsDB reports failures in the result rather than raising
+        if isinstance(result, dict) and result.get('status') == 'error':
+            raise RuntimeError(result['error'])
+
+
+def _sync_calendars(sync_calendars, calendar):
+    # A background job can't run the interactive OAuth flow, so until
+    # `flask calendar auth` has written token.pickle there is nothing to do
+    if calendar is None and not os.path.exists('token.pickle'):
+        logger.debug("No token.pickle yet, skipping calendar sync")
+        return
+    sync_calendars(client=calendar)
+
+
+def register_integration_jobs(scheduler, app, weather=None, clickup=None, calendar=None, things=None):
+    """Add the weather, ClickUp, calendar and Things refresh jobs to ``scheduler``.
+
+    Clients default to the real ones; pass fakes to test the schedule. ClickUp
+    only runs with CLICKUP_API_KEY set, unless a client is passed in. The
+    calendar job is always scheduled but does nothing until
+    ``flask calendar auth`` has produced token.pickle, so authorizing
+    doesn't need a restart.
+
+    Weather, ClickUp and calendar results are stored where every worker
+    reads them (the forecast file and the database). The Things index lives
+    in process memory, so the Things job only keeps the leader's index warm;
+    other workers still rebuild their own when the Things database changes.
+    """
+    from .weather_integration import WeatherClient, configured_locations
+    from .things_integration import ThingsDB
+
+    weather = weather or WeatherClient()
+    locations = configured_locations()
+    lead = timedelta(seconds=WEATHER_REFRESH_INTERVAL)
+    scheduler.add('weather', lambda: weather.prefetch(locations, lead), WEATHER_REFRESH_INTERVAL)
+
+    if clickup is not None or os.getenv('CLICKUP_API_KEY'):
+        from .clickup_sync import sync_clickup_tasks
+        scheduler.add('clickup', _in_app_context(app, lambda: sync_clickup_tasks(client=clickup)),
+                      CLICKUP_SYNC_INTERVAL)
+
+    try:
+        from .calendar_sync import sync_calendars
+        scheduler.add('calendar', _in_app_context(app, lambda: _sync_calendars(sync_calendars, calendar)),
+                      CALENDAR_SYNC_INTERVAL)
+    except ImportError:
+        logger.warning("Calendar integration not available, not scheduling calendar sync")
+
+    things = things or ThingsDB()
+    scheduler.add('things', lambda: _refresh_things(things), THINGS_REFRESH_INTERVAL)
+    return scheduler
+
+
+def start_scheduler(app):
+    """Start the integration scheduler if this process wins the leader lock.
+
+    Under a multi-worker server only the first worker to take the lock
+    (SCHEDULER_LOCK_PATH, default ``<instance>/scheduler.lock``) refreshes;
+    the others read what it stored. It never starts in the debug reloader's
+    parent process, which only watches files, nor for ``flask`` commands
+    other than ``run``. Set SCHEDULER_ENABLED=0 to turn it off, e.g. for
+    scripts and tests that build the app themselves.
+    """
+    if os.getenv('SCHEDULER_ENABLED', '1') == '0':
+        return None
+
+    # Under the flask command the app is also created for one-off commands
+    # (e.g. `flask reflections rebuild-stats`); only `flask run` serves
+    if os.getenv('FLASK_RUN_FROM_CLI') == 'true':
+        ctx = click.get_current_context(silent=True)
+        if ctx is None or ctx.command.name != 'run':
+            return None
+
+    # The debug reloader runs the server in a child process with
+    # WERKZEUG_RUN_MAIN=true; the parent would otherwise take the lock first
+    if app.debug and os.getenv('WERKZEUG_RUN_MAIN') != 'true':
+        return None
+
+    os.makedirs(app.instance_path, exist_ok=True)
+    lock_path = os.getenv('SCHEDULER_LOCK_PATH') or os.path.join(app.instance_path, 'scheduler.lock')
+    lock_file = acquire_leader_lock(lock_path)
+    if lock_file is None:
+        logger.info("Another process holds %s, not starting the scheduler", lock_path)
+        return None
+
+    executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='scheduled')
+    scheduler = register_integration_jobs(Scheduler(executor=executor), app)
+    scheduler.lock_file = lock_file
+    app.extensions['scheduler'] = scheduler
+    scheduler.start()
+    logger.info("Scheduler started with jobs: %s", ', '.join(scheduler.jobs))
+    return scheduler
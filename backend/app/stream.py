@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, current_app
+from .fanout import run_fanout
+from .routes import build_ceo_overview, CEO_OVERVIEW_BUDGET
+from .things_integration import ThingsDB
+
+logger = logging.getLogger(__name__)
+
+# Create Blueprint
+stream_bp = Blueprint('stream', __name__, url_prefix='/api')
+
+# Seconds between refresh cycles while at least one stream is open
+STREAM_REFRESH_INTERVAL = float(os.getenv('STREAM_REFRESH_INTERVAL', 30))
+
+# Send a comment line after this many idle seconds so proxies keep the connection open
+STREAM_KEEPALIVE = 15.0
+
+# Per-source deadlines (seconds) for the sections not already in the overview
+STREAM_DEADLINES = {
+    'tasks': 3.0,
+    'calendar': 6.0
+}
+
+
+def _stream_tasks():
+    return ThingsDB().get_today_tasks()
+
+
+def _stream_calendar():
+    from .calendar_sync import get_local_events
+    today = datetime.now()
+    return get_local_events(
+        start_date=today - timedelta(days=1),
+        end_date=today + timedelta(days=7)
+    )
+
+
+def collect_sections(app):
+    """Build every dashboard section once: overview, tasks, weather and calendar."""
+    overview = build_ceo_overview(app)
+    results = run_fanout({
+        'tasks': (_stream_tasks, STREAM_DEADLINES['tasks']),
+        'calendar': (_stream_calendar, STREAM_DEADLINES['calendar'])
+    }, budget=CEO_OVERVIEW_BUDGET, app=app, namespace='stream')
+    return {
+        'overview': overview,
+        'tasks': results['tasks']['data'],
+        'weather': overview['weather'],
+        'calendar': results['calendar']['data']
+    }
+
+
+def _format_event(event, version, sections):
+    """One SSE message; ``sections`` maps names to already-encoded JSON."""
+    body = ','.join(f'{json.dumps(name)}:{encoded}' for name, encoded in sections.items())
+    return f'event: {event}\nid: {version}\ndata: {{"version":{version},"sections":{{{body}}}}}\n\n'
+
+
+class SnapshotHub:
+    """Latest dashboard sections, shared by every open stream.
+
+    A single refresher thread calls ``collect`` every ``interval`` seconds
+    while anyone is subscribed, so N open dashboards cost one refresh cycle.
+    Each section remembers the version it last changed at; subscribers only
+    receive sections that changed since the version they last saw.
+    """
+
+    def __init__(self, collect, interval=STREAM_REFRESH_INTERVAL):
+        self.collect = collect
+        self.interval = interval
+        self.version = 0
+        # name -> (version, encoded JSON)
+        self._sections = {}
+        self._condition = threading.Condition()
+        self._subscribers = 0
+        self._thread = None
+
+    def refresh(self):
+        """Run one refresh cycle and return the names of the sections that changed."""
+        sections = self.collect()
+        changed = []
+        with self._condition:
+            version = self.version + 1
+            for name, data in sections.items():
+                encoded = json.dumps(data, sort_keys=True, default=str)
+                previous = self._sections.get(name)
+                if previous is None or previous[1] != encoded:
+                    self._sections[name] = (version, encoded)
+                    changed.append(name)
+            if changed:
+                self.version = version
+                self._condition.notify_all()
+        return changed
+
+    def wait_for_changes(self, since, timeout):
+        """Block until a version newer than ``since`` exists or ``timeout`` passes.
+
+        Returns the current version and the encoded sections newer than ``since``.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.version > since, timeout)
+            changes = {name: encoded for name, (version, encoded) in self._sections.items() if version > since}
+            return self.version, changes
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                changed = self.refresh()
+                logger.debug("Stream refresh changed %s", changed or 'nothing')
+            except Exception as e:
+                logger.error("Error refreshing stream sections: %s", e)
+            time.sleep(self.interval)
+
+    def subscribe(self):
+        """Register a listener and start the refresher if it isn't running."""
+        with self._condition:
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stream-refresh', daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self):
+        with self._condition:
+            self._subscribers -= 1
+
+    def events(self, keepalive=STREAM_KEEPALIVE):
+        """SSE messages for one listener: a full snapshot, then changed sections only."""
+        self.subscribe()
+        try:
+            seen = 0
+            while True:
+                version, changes = self.wait_for_changes(seen, keepalive)
+                if changes:
+                    yield _format_event('snapshot' if seen == 0 else 'update', version, changes)
+                    seen = version
+                else:
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe()
+
+
+def get_hub(app):
+    """The app's SnapshotHub, created on first use."""
+    hub = app.extensions.get('stream_hub')
+    if hub is None:
+        hub = app.extensions.setdefault('stream_hub', SnapshotHub(lambda: collect_sections(app)))
+    return hub
+
+
+@stream_bp.route('/stream', methods=['GET'])
+def stream():
+    """Server-Sent Events feed of dashboard sections.
+
+    The first message (``event: snapshot``) carries every section; later
+    ``event: update`` messages carry only the sections that changed.
+    """
+    hub = get_hub(current_app._get_current_object())
+    return Response(hub.events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -5,10 +5,13 @@ import sys
 from datetime import datetime, timedelta
 import json
 import os
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+import sqlite3
+import threading
+from urllib.request import pathname2url
+from .logging_utils import ItemSampler, log_summary
 
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                   handlers=[logging.StreamHandler(sys.stdout)])
 logger = logging.getLogger(__name__)
 
 things_bp = Blueprint('things', __name__)
@@ -30,16 +33,240 @@ def test_endpoint():
     """Simple test endpoint to verify the API is responding"""
     return jsonify({"status": "API is working"})
 
+class TaskIndex:
+    """Open Things to-dos loaded once, indexed by start, start date, area and project."""
+
+    def __init__(self, tasks):
+        self.tasks = [task for task in tasks if task.get('status') != 'completed']
+        self.by_uuid = {}
+        self.by_start = defaultdict(list)
+        self.by_start_date = defaultdict(list)
+        self.by_area = defaultdict(list)
+        self.by_project = defaultdict(list)
+        self.anytime_today = []
+
+        for task in self.tasks:
+            self.by_uuid[task['uuid']] = task
+            start = task.get('start', '')
+            self.by_start[start].append(task)
+            if task.get('start_date'):
+                self.by_start_date[task['start_date']].append(task)
+            self.by_area[task.get('area_title') or task.get('project_title') or 'No Area'].append(task)
+            if task.get('project_title'):
+                self.by_project[task['project_title']].append(task)
+            # Anytime tasks moved to Today carry a positive today_index
+            if start == 'Anytime' and (task.get('today_index') or 0) > 0:
+                self.anytime_today.append(task)
+
+        self.start_dates = sorted(self.by_start_date)
+
+    def today(self, today):
+        """Tasks in the Today view for ``today`` (YYYY-MM-DD), in Things order.
+
+        A task is in Today view if it's explicitly set to start Today, has
+        today's date as start date, or is in Anytime and has been moved to
+        Today (positive today_index).
+        """
+        seen = set()
+        today_tasks = []
+        for task in self.by_start['Today'] + self.by_start_date.get(today, []) + self.anytime_today:
+            if task['uuid'] not in seen:
+                seen.add(task['uuid'])
+                today_tasks.append(task)
+        today_tasks.sort(key=lambda x: x.get('today_index', 0))
+        return today_tasks
+
+    def starting_between(self, first_day, last_day):
+        """Tasks with a start date in [first_day, last_day], grouped by date in order."""
+        lo = bisect_left(self.start_dates, first_day)
+        hi = bisect_right(self.start_dates, last_day)
+        return [(day, self.by_start_date[day]) for day in self.start_dates[lo:hi]]
+
+    def area(self, area_title):
+        """Open tasks in an area (or project, for tasks outside any area)."""
+        return self.by_area.get(area_title, [])
+
+    def project(self, project_title):
+        """Open tasks in a project."""
+        return self.by_project.get(project_title, [])
+
+
+def _default_things_path():
+    return os.getenv(things.database.ENVIRONMENT_VARIABLE_WITH_FILEPATH) or things.database.DEFAULT_FILEPATH
+
+
+class ThingsWatcher:
+    """Keeps a TaskIndex for one Things database and rebuilds it only when the file changes.
+
+    A change is detected from the mtime and size of ``main.sqlite`` and its
+    ``-wal`` file, which is a couple of stat() calls per request. Results
+    derived from the index are memoized until the next change. Point it at any
+    SQLite file with the Things schema (e.g. a synthetic fixture on Linux) by
+    passing ``filepath`` or setting THINGSDB.
+    """
+
+    def __init__(self, filepath=None):
+        self.filepath = filepath or _default_things_path()
+        self._fingerprint = None
+        self._index = None
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self):
+        stamps = []
+        for path in (self.filepath, self.filepath + '-wal'):
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def _refresh(self):
+        fingerprint = self.fingerprint()
+        if self._index is not None and fingerprint == self._fingerprint:
+            return
+        self._index = TaskIndex(things.todos(filepath=self.filepath))
+        self._fingerprint = fingerprint
+        self._results.clear()
+        logger.info("Indexed %d open tasks from Things 3", len(self._index.tasks))
+
+    def index(self):
+        """The current TaskIndex, rebuilt first if the database changed."""
+        with self._lock:
+            self._refresh()
+            return self._index
+
+    def completed_between(self, start, end):
+        """Logbook entries completed in [start, end), re-queried only after a database change."""
+        return self.memoize(
+            ('completed', start, end),
+            lambda index: query_completed_between(self.filepath, start, end)
+        )
+
+    def memoize(self, key, compute):
+        """Return ``compute(index)`` for ``key``, recomputing only after a database change."""
+        with self._lock:
+            self._refresh()
+            if key not in self._results:
+                self._results[key] = compute(self._index)
+            return self._results[key]
+
+
+# Logbook rows in a stop-date window. The range is applied to the raw
+# stopDate column (Unix time, UTC) so SQLite can seek on it instead of
+# evaluating a date function for every completed task.
+COMPLETED_BETWEEN_SQL = """
+    SELECT
+        TASK.uuid,
+        TASK.title,
+        TASK.notes,
+        TASK.stopDate,
+        CASE WHEN TASK.status = 2 THEN 'canceled' ELSE 'completed' END AS status,
+        AREA.title AS area_title,
+        PROJECT.title AS project_title,
+        (
+            SELECT group_concat(TAG.title, char(31))
+            FROM TMTaskTag AS TASK_TAG
+            JOIN TMTag AS TAG ON TAG.uuid = TASK_TAG.tags
+            WHERE TASK_TAG.tasks = TASK.uuid
+        ) AS tags
+    FROM TMTask AS TASK
+    LEFT OUTER JOIN TMTask AS PROJECT ON TASK.project = PROJECT.uuid
+    LEFT OUTER JOIN TMArea AS AREA ON TASK.area = AREA.uuid
+    WHERE TASK.stopDate >= ? AND TASK.stopDate < ?
+        AND TASK.status IN (2, 3)
+        AND TASK.trashed = 0
+        AND TASK.type IN (0, 1)
+    ORDER BY TASK.stopDate DESC
+"""
+
+def query_completed_between(filepath, start, end):
+    """Read logbook entries with a stop date in [start, end) straight from SQLite.
+
+    The database is opened read-only. Rows come back in the same shape as
+    things.logbook() entries, most recent first.
+    """
+    uri = f"file:{pathname2url(filepath)}?mode=ro"
+    connection = sqlite3.connect(uri, uri=True)
+    try:
+        connection.row_factory = sqlite3.Row
+        rows = connection.execute(COMPLETED_BETWEEN_SQL, (start.timestamp(), end.timestamp())).fetchall()
+    finally:
+        connection.close()
+
+    tasks = []
+    for row in rows:
+        task = {
+            'uuid': row['uuid'],
+            'title': row['title'],
+            'notes': row['notes'] or '',
+            'status': row['status'],
+            'stop_date': datetime.fromtimestamp(row['stopDate']).strftime('%Y-%m-%d %H:%M:%S'),
+            'tags': row['tags'].split('\x1f') if row['tags'] else []
+        }
+        if row['area_title']:
+            task['area_title'] = row['area_title']
+        if row['project_title']:
+            task['project_title'] = row['project_title']
+        tasks.append(task)
+    return tasks
+
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+def get_things_watcher(filepath=None):
+    """Get the process-wide watcher for a Things database file."""
+    filepath = filepath or _default_things_path()
+    with _watchers_lock:
+        if filepath not in _watchers:
+            _watchers[filepath] = ThingsWatcher(filepath)
+        return _watchers[filepath]
+
+
+def _task_info(task):
+    return {
+        'title': task.get('title', ''),
+        'status': task.get('status', ''),
+        'notes': task.get('notes', ''),
+        'project_title': task.get('project_title', ''),
+        'today_index': task.get('today_index', 0),
+        'start_date': task.get('start_date'),
+        'deadline': task.get('deadline')
+    }
+
 class ThingsDB:
-    def __init__(self):
-        logger.info("Initializing ThingsDB")
+    def __init__(self, filepath=None):
+        """Set up access to the Things 3 database.
+
+        ``filepath`` overrides the database location (things.py also honours
+        the THINGSDB environment variable). Nothing is read until a query runs.
+        """
+        logger.debug("Initializing ThingsDB")
+        self.filepath = filepath
+        self.snapshot_file = 'today_tasks_snapshot.json'
+
+    def _things_kwargs(self):
+        return {'filepath': self.filepath} if self.filepath else {}
+
+    @property
+    def watcher(self):
+        return get_things_watcher(self.filepath)
+
+    def get_index(self):
+        """Open to-dos indexed for today/upcoming/area queries, rebuilt only when Things changes."""
+        return self.watcher.index()
+
+    def test_connection(self):
+        """Check the database is readable with a small query instead of loading every to-do."""
         try:
-            # Test Things connection immediately
-            things.todos()
+            things.areas(**self._things_kwargs())
             logger.info("Successfully connected to Things 3")
-            self.snapshot_file = 'today_tasks_snapshot.json'
+            return True
         except Exception as e:
-            logger.error(f"Failed to connect to Things 3: {str(e)}")
+            logger.error("Failed to connect to Things 3: %s", e)
+            return False
     
     def save_today_snapshot(self, task_ids):
         """Save a snapshot of task IDs that are in Today view"""
@@ -49,7 +276,7 @@ class ThingsDB:
         }
         with open(self.snapshot_file, 'w') as f:
             json.dump(snapshot, f)
-        logger.info(f"Saved snapshot with {len(task_ids)} tasks")
+        logger.info("Saved snapshot with %d tasks", len(task_ids))
     
     def load_today_snapshot(self):
         """Load the most recent snapshot of Today tasks"""
@@ -57,103 +284,109 @@ class ThingsDB:
             if os.path.exists(self.snapshot_file):
                 with open(self.snapshot_file, 'r') as f:
                     snapshot = json.load(f)
-                logger.info(f"Loaded snapshot from {snapshot['date']}")
+                logger.info("Loaded snapshot from %s", snapshot['date'])
                 return snapshot['task_ids']
         except Exception as e:
-            logger.error(f"Error loading snapshot: {str(e)}")
+            logger.error("Error loading snapshot: %s", e)
         return None
 
     def get_today_tasks(self):
         try:
-            all_tasks = things.todos()
-            logger.info(f"Retrieved {len(all_tasks)} total tasks from Things 3")
-            
-            areas = {}
-            today_tasks = []
             today = datetime.now().strftime('%Y-%m-%d')
+            return self.watcher.memoize(('today', today), lambda index: self._today_result(index, today))
+        except Exception as e:
+            logger.error("Error getting tasks from Things 3: %s", e)
+            return {'status': 'error', 'error': f'Error getting tasks from Things 3: {str(e)}'}
+
+    def _today_result(self, index, today):
+        today_tasks = index.today(today)
+        logger.debug("Found %d tasks for Today view", len(today_tasks))
+
+        # Group tasks by area
+        areas = {}
+        for task in today_tasks:
+            area_title = task.get('area_title', '')
+            if not area_title:
+                area_title = task.get('project_title', 'No Area')
             
-            for task in all_tasks:
-                if task.get('status') == 'completed':
-                    continue
-                    
-                # Get key fields that determine if a task is in Today view
-                start = task.get('start', '')
-                start_date = task.get('start_date')
-                today_index = task.get('today_index', 0)
-                
-                # A task is in Today view if:
-                # 1. It's explicitly set to start Today, or
-                # 2. It has today's date as start date, or
-                # 3. It's in Anytime and has been moved to Today (positive today_index)
-                if (start == 'Today' or 
-                    start_date == today or 
-                    (start == 'Anytime' and today_index > 0)):
-                    today_tasks.append(task)
-                    logger.info(f"\nIncluding task in Today view: {task.get('title')}")
-                    logger.info(f"  start: {start}")
-                    logger.info(f"  start_date: {start_date}")
-                    logger.info(f"  today_index: {today_index}")
-
-            # Sort tasks by today_index to maintain Things 3 order
-            today_tasks.sort(key=lambda x: x.get('today_index', 0))
-            logger.info(f"\nAfter filtering: Found {len(today_tasks)} tasks for Today view")
-
-            # Group tasks by area
-            for task in today_tasks:
-                area_title = task.get('area_title', '')
-                if not area_title:
-                    area_title = task.get('project_title', 'No Area')
-                
-                # Create task info
-                task_info = {
-                    'title': task.get('title', ''),
-                    'status': task.get('status', ''),
-                    'notes': task.get('notes', ''),
-                    'project_title': task.get('project_title', ''),
-                    'today_index': task.get('today_index', 0),
-                    'start_date': task.get('start_date'),
-                    'deadline': task.get('deadline')
-                }
-                
-                # Initialize area if not exists
-                if area_title not in areas:
-                    areas[area_title] = []
-                areas[area_title].append(task_info)
+            # Initialize area if not exists
+            if area_title not in areas:
+                areas[area_title] = []
+            areas[area_title].append(_task_info(task))
+
+        return {
+            "status": "success",
+            "message": f"Found {len(today_tasks)} tasks in Today view",
+            "areas": areas
+        }
+
+    def get_upcoming_tasks(self, days=7):
+        """Get tasks scheduled to start from tomorrow through the next ``days`` days"""
+        try:
+            tomorrow = datetime.now().date() + timedelta(days=1)
+            last_day = tomorrow + timedelta(days=days - 1)
+            return self.watcher.memoize(
+                ('upcoming', tomorrow, days),
+                lambda index: self._upcoming_result(index, tomorrow, last_day)
+            )
+        except Exception as e:
+            logger.error("Error getting upcoming tasks from Things 3: %s", e)
+            return {'status': 'error', 'error': f'Error getting upcoming tasks from Things 3: {str(e)}'}
+
+    def _upcoming_result(self, index, first_day, last_day):
+        upcoming = index.starting_between(first_day.isoformat(), last_day.isoformat())
+        days_list = [
+            {'date': day, 'tasks': [_task_info(task) for task in tasks]}
+            for day, tasks in upcoming
+        ]
+        return {
+            'status': 'success',
+            'total_tasks': sum(len(day['tasks']) for day in days_list),
+            'days': days_list
+        }
 
+    def get_area_tasks(self, area_title):
+        """Get open tasks in an area"""
+        try:
+            tasks = self.get_index().area(area_title)
             return {
-                "status": "success",
-                "message": f"Found {len(today_tasks)} tasks in Today view",
-                "areas": areas
+                'status': 'success',
+                'area': area_title,
+                'total_tasks': len(tasks),
+                'tasks': [_task_info(task) for task in tasks]
             }
+        except Exception as e:
+            logger.error("Error getting area tasks from Things 3: %s", e)
+            return {'status': 'error', 'error': f'Error getting area tasks from Things 3: {str(e)}'}
 
+    def get_project_tasks(self, project_title):
+        """Get open tasks in a project"""
+        try:
+            tasks = self.get_index().project(project_title)
+            return {
+                'status': 'success',
+                'project': project_title,
+                'total_tasks': len(tasks),
+                'tasks': [_task_info(task) for task in tasks]
+            }
         except Exception as e:
-            logger.error(f"Error getting tasks from Things 3: {str(e)}")
-            return {'status': 'error', 'error': f'Error getting tasks from Things 3: {str(e)}'}
+            logger.error("Error getting project tasks from Things 3: %s", e)
+            return {'status': 'error', 'error': f'Error getting project tasks from Things 3: {str(e)}'}
 
     def get_yesterday_completed_tasks(self):
         try:
-            logger.info("Getting yesterday's completed tasks")
-            yesterday = datetime.now() - timedelta(days=1)
+            today_start = datetime.combine(datetime.now().date(), datetime.min.time())
+            yesterday = today_start - timedelta(days=1)
             yesterday_str = yesterday.strftime('%Y-%m-%d')
             
-            # Use logbook() instead of todos() to get completed tasks
-            completed_tasks = things.logbook()
-            
-            # Log all tasks with completion dates for debugging
-            for task in completed_tasks:
-                logger.info(f"Found completed task: {task.get('title')} - Stop Date: {task.get('stop_date')} - Status: {task.get('status')}")
+            # Only yesterday's logbook rows are read from the database
+            yesterday_tasks = self.watcher.completed_between(yesterday, today_start)
             
-            yesterday_tasks = [
-                task for task in completed_tasks 
-                if task.get('stop_date', '').startswith(yesterday_str)
-            ]
-            
-            logger.info(f"Found {len(yesterday_tasks)} tasks completed yesterday")
-            if yesterday_tasks:
-                logger.info(f"Sample completed task: {yesterday_tasks[0]}")
+            logger.debug("Found %d tasks completed yesterday", len(yesterday_tasks))
             
             # Group tasks by project/area
             projects = {}
+            sampler = ItemSampler(logger)
             for task in yesterday_tasks:
                 # Try to get area first, then project, then default
                 project_name = task.get('area_title') or task.get('project_title') or 'No Project'
@@ -168,7 +401,8 @@ class ThingsDB:
                     'tags': task.get('tags', [])
                 }
                 projects[project_name].append(task_info)
-                logger.info(f"Added completed task: {task_info['title']} to project: {project_name}")
+                sampler.debug("Completed task %r (stop_date=%s, status=%s) -> %s",
+                              task_info['title'], task.get('stop_date'), task.get('status'), project_name)
             
             # Convert to list and sort by project name
             projects_list = [
@@ -183,30 +417,24 @@ class ThingsDB:
                 'projects': projects_list
             }
         except Exception as e:
-            logger.error(f"Error getting completed tasks: {str(e)}")
+            logger.error("Error getting completed tasks: %s", e)
             return {'status': 'error', 'message': f'Error getting completed tasks: {str(e)}'}
 
     def get_recent_completed_tasks(self):
         """Get tasks completed since yesterday (including today)"""
         try:
-            logger.info("Getting tasks completed since yesterday")
-            yesterday = datetime.now() - timedelta(days=1)
-            yesterday_str = yesterday.strftime('%Y-%m-%d')
-            today = datetime.now().strftime('%Y-%m-%d')
-            
-            completed_tasks = things.logbook()
+            today_start = datetime.combine(datetime.now().date(), datetime.min.time())
+            yesterday = today_start - timedelta(days=1)
+            tomorrow = today_start + timedelta(days=1)
             
             # Get tasks completed yesterday or today
-            recent_tasks = [
-                task for task in completed_tasks 
-                if task.get('stop_date', '').startswith(yesterday_str) or 
-                   task.get('stop_date', '').startswith(today)
-            ]
+            recent_tasks = self.watcher.completed_between(yesterday, tomorrow)
             
-            logger.info(f"Found {len(recent_tasks)} tasks completed since yesterday")
+            logger.debug("Found %d tasks completed since yesterday", len(recent_tasks))
             
             # Group tasks by completion date, then by project/area
             days = {}
+            sampler = ItemSampler(logger)
             for task in recent_tasks:
                 stop_date = task.get('stop_date', '').split()[0]  # Get just the date part
                 if stop_date not in days:
@@ -224,7 +452,7 @@ class ThingsDB:
                     'tags': task.get('tags', [])
                 }
                 days[stop_date][project_name].append(task_info)
-                logger.info(f"Added task: {task_info['title']} to {project_name} on {stop_date}")
+                sampler.debug("Completed task %r -> %s on %s", task_info['title'], project_name, stop_date)
             
             # Convert the nested dict to a more organized structure
             days_list = []
@@ -246,30 +474,33 @@ class ThingsDB:
             }
             
         except Exception as e:
-            logger.error(f"Error getting completed tasks: {str(e)}")
+            logger.error("Error getting completed tasks: %s", e)
             return {'status': 'error', 'message': f'Error getting completed tasks: {str(e)}'}
 
 @things_bp.route('/api/tasks/today')
 def get_today_tasks():
     """Endpoint to get today's tasks from Things 3"""
     try:
-        logger.info("API endpoint /api/tasks/today called")
-        db = ThingsDB()
-        result = db.get_today_tasks()
-        logger.info(f"API result: {result}")
-        
-        # Ensure we always return a response
-        if result is None:
-            logger.error("get_today_tasks returned None")
-            return jsonify({
-                "status": "error",
-                "message": "No response from Things 3 integration"
-            }), 500
+        with log_summary(logger, '/api/tasks/today') as summary:
+            db = ThingsDB()
+            result = db.get_today_tasks()
             
-        return jsonify(result)
+            # Ensure we always return a response
+            if result is None:
+                logger.error("get_today_tasks returned None")
+                summary['status'] = 'empty'
+                return jsonify({
+                    "status": "error",
+                    "message": "No response from Things 3 integration"
+                }), 500
+
+            summary['status'] = result.get('status')
+            summary['areas'] = len(result.get('areas', {}))
+            summary['tasks'] = sum(len(tasks) for tasks in result.get('areas', {}).values())
+            return jsonify(result)
         
     except Exception as e:
-        logger.error(f"Error in API endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in API endpoint: %s", e, exc_info=True)
         return jsonify({
             "status": "error",
             "message": str(e),
@@ -280,13 +511,15 @@ def get_today_tasks():
 def get_yesterday_completed():
     """Endpoint to get yesterday's completed tasks"""
     try:
-        logger.info("API endpoint /api/tasks/yesterday/completed called")
-        db = ThingsDB()
-        result = db.get_yesterday_completed_tasks()
-        logger.info(f"API result: {result}")
-        return jsonify(result)
+        with log_summary(logger, '/api/tasks/yesterday/completed') as summary:
+            db = ThingsDB()
+            result = db.get_yesterday_completed_tasks()
+            summary['status'] = result.get('status')
+            summary['completed'] = result.get('total_completed', 0)
+            summary['projects'] = len(result.get('projects', []))
+            return jsonify(result)
     except Exception as e:
-        logger.error(f"Error in API endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in API endpoint: %s", e, exc_info=True)
         return jsonify({
             "status": "error",
             "message": str(e),
@@ -297,33 +530,29 @@ def get_yesterday_completed():
 def save_snapshot():
     """Endpoint to save current Today tasks as a snapshot"""
     try:
-        logger.info("API endpoint /api/tasks/today/save_snapshot called")
-        db = ThingsDB()
-        all_tasks = things.todos()
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        # Get IDs of tasks that are in Today view
-        task_ids = []
-        for task in all_tasks:
-            if task.get('status') != 'completed':
-                # Debug: Print ALL task properties
-                title = task.get('title', '')
-                logger.info(f"\n=== Analyzing task: {title} ===")
-                for key, value in task.items():
-                    logger.info(f"  {key}: {value}")
+        with log_summary(logger, '/api/tasks/today/save_snapshot') as summary:
+            db = ThingsDB()
+            
+            # Get IDs of tasks that are in Today view
+            task_ids = []
+            sampler = ItemSampler(logger)
+            # The index only holds non-completed tasks
+            for task in db.get_index().tasks:
+                # Debug: sample full task properties
+                sampler.debug("Snapshot task %r: %s", task.get('title', ''), task)
                 
                 # For now, include all non-completed tasks to see what we get
                 task_ids.append(task['uuid'])
-                logger.info("  -> Including task for analysis")
-        
-        db.save_today_snapshot(task_ids)
-        return jsonify({
-            "status": "success",
-            "message": f"Saved snapshot with {len(task_ids)} tasks"
-        })
+            
+            db.save_today_snapshot(task_ids)
+            summary['tasks'] = len(task_ids)
+            return jsonify({
+                "status": "success",
+                "message": f"Saved snapshot with {len(task_ids)} tasks"
+            })
         
     except Exception as e:
-        logger.error(f"Error in API endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in API endpoint: %s", e, exc_info=True)
         return jsonify({
             "status": "error",
             "message": str(e),
@@ -334,15 +563,17 @@ def save_snapshot():
 def get_recent_completed():
     """Endpoint to get tasks completed since yesterday (including today)"""
     try:
-        logger.info("API endpoint /api/tasks/completed/recent called")
-        db = ThingsDB()
-        result = db.get_recent_completed_tasks()
-        logger.info(f"API result: {result}")
-        return jsonify(result)
+        with log_summary(logger, '/api/tasks/completed/recent') as summary:
+            db = ThingsDB()
+            result = db.get_recent_completed_tasks()
+            summary['status'] = result.get('status')
+            summary['completed'] = result.get('total_completed', 0)
+            summary['days'] = len(result.get('days', []))
+            return jsonify(result)
     except Exception as e:
-        logger.error(f"Error in API endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in API endpoint: %s", e, exc_info=True)
         return jsonify({
             "status": "error",
             "message": str(e),
             "trace": str(sys.exc_info())
-        }), 500 
\ No newline at end of file
+        }), 500 
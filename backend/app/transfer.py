@@ -0,0 +1,206 @@
+import io
+import json
+import logging
+from datetime import date, datetime
+from sqlalchemy import insert, select
+from .analytics import recompute_days
+from .models import db, Reflection, Image, local_day
+
+logger = logging.getLogger(__name__)
+
+# Reflections fetched per round trip while exporting
+EXPORT_CHUNK = 500
+
+# Lines inserted per transaction while importing
+IMPORT_BATCH = 5000
+
+REFLECTION_FIELDS = ('type', 'priorities', 'intention', 'reflection', 'challenges', 'tomorrow')
+IMAGE_FIELDS = ('filename', 'path', 'sha256', 'size', 'content_type')
+
+
+class InvalidImportLine(ValueError):
+    """An import line that isn't a valid reflection record.
+
+    ``line`` is its line number and ``committed`` the counts of the batches
+    already committed before it, including ``last_line``, the last line
+    they covered (0 if none), so a client knows where to resume.
+    """
+
+    def __init__(self, message, line=None, committed=None):
+        super().__init__(message)
+        self.line = line
+        self.committed = committed
+
+
+def _images_by_reflection(reflection_ids):
+    """Image metadata for a chunk of reflections, in one query."""
+    images = {}
+    rows = db.session.execute(
+        select(Image.reflection_id, Image.uploaded_at, *(getattr(Image, field) for field in IMAGE_FIELDS))
+        .where(Image.reflection_id.in_(reflection_ids))
+        .order_by(Image.id)
+    )
+    for row in rows:
+        record = {field: getattr(row, field) for field in IMAGE_FIELDS}
+        record['uploaded_at'] = row.uploaded_at.isoformat() if row.uploaded_at else None
+        images.setdefault(row.reflection_id, []).append(record)
+    return images
+
+
+def export_lines(first_day=None, last_day=None):
+    """Yield every reflection (with its image metadata) as one NDJSON line, oldest first.
+
+    Rows are streamed from the database EXPORT_CHUNK at a time and images are
+    fetched once per chunk, so memory stays flat however long the history is.
+    """
+    query = select(
+        Reflection.id, Reflection.date, Reflection.day,
+        *(getattr(Reflection, field) for field in REFLECTION_FIELDS)
+    ).order_by(Reflection.id)
+    if first_day:
+        query = query.where(Reflection.day >= first_day)
+    if last_day:
+        query = query.where(Reflection.day <= last_day)
+
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_CHUNK))
+    for chunk in result.partitions():
+        images = _images_by_reflection([row.id for row in chunk])
+        for row in chunk:
+            record = {
+                'id': row.id,
+                'date': row.date.isoformat() if row.date else None,
+                'day': row.day.isoformat() if row.day else None
+            }
+            record.update({field: getattr(row, field) for field in REFLECTION_FIELDS})
+            record['images'] = images.get(row.id, [])
+            yield json.dumps(record) + '\n'
+
+
+def _is_int(value):
+    # JSON true/false arrive as bool, which is an int subclass
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_fields(record, text_fields, prefix=''):
+    """Raise InvalidImportLine unless every field in ``text_fields`` is a string or null."""
+    for field in text_fields:
+        value = record.get(field)
+        if value is not None and not isinstance(value, str):
+            raise InvalidImportLine(f"'{prefix}{field}' must be a string or null")
+
+
+def _reflection_row(record):
+    """Validate one import record and turn it into reflection column values.
+
+    Every value is type-checked here, so a bad line is reported with its
+    line number instead of failing later inside the batch insert.
+    """
+    if not isinstance(record, dict):
+        raise InvalidImportLine('expected a JSON object')
+    images = record.get('images') or []
+    if not isinstance(images, list) or not all(isinstance(image, dict) for image in images):
+        raise InvalidImportLine("'images' must be a list of objects")
+    if record.get('id') is not None and not _is_int(record['id']):
+        raise InvalidImportLine("'id' must be an integer")
+    _check_fields(record, REFLECTION_FIELDS + ('date', 'day'))
+    for image in images:
+        _check_fields(image, ('filename', 'path', 'sha256', 'content_type', 'uploaded_at'), prefix='images.')
+        if image.get('size') is not None and not _is_int(image['size']):
+            raise InvalidImportLine("'images.size' must be an integer or null")
+    row = {field: record.get(field) for field in REFLECTION_FIELDS}
+    row['date'] = datetime.fromisoformat(record['date']) if record.get('date') else datetime.utcnow()
+    row['day'] = date.fromisoformat(record['day']) if record.get('day') else local_day(row['date'])
+    return row
+
+
+def _image_row(record, reflection_id):
+    row = {field: record.get(field) for field in IMAGE_FIELDS}
+    row['reflection_id'] = reflection_id
+    row['uploaded_at'] = datetime.fromisoformat(record['uploaded_at']) if record.get('uploaded_at') else datetime.utcnow()
+    return row
+
+
+def _insert_batch(batch):
+    """Insert one batch of parsed records in the current transaction.
+
+    Records keeping their exported ``id`` are skipped if that id already
+    exists, so importing the same export twice doesn't duplicate entries.
+    Returns (inserted, skipped, images).
+    """
+    wanted_ids = [record['id'] for record, _ in batch if record.get('id') is not None]
+    existing = set()
+    for i in range(0, len(wanted_ids), 500):
+        existing.update(db.session.execute(
+            select(Reflection.id).where(Reflection.id.in_(wanted_ids[i:i + 500]))
+        ).scalars())
+
+    with_id, without_id = [], []
+    for record, row in batch:
+        if record.get('id') is None:
+            without_id.append((record, row))
+        elif record['id'] not in existing:
+            existing.add(record['id'])
+            with_id.append((record, dict(row, id=record['id'])))
+
+    if with_id:
+        db.session.execute(insert(Reflection), [row for _, row in with_id])
+    new_ids = []
+    if without_id:
+        new_ids = db.session.execute(
+            insert(Reflection).returning(Reflection.id, sort_by_parameter_order=True),
+            [row for _, row in without_id]
+        ).scalars().all()
+
+    images = []
+    for (record, row), reflection_id in zip(with_id + without_id, [row['id'] for _, row in with_id] + new_ids):
+        images.extend(_image_row(image, reflection_id) for image in record.get('images') or [])
+    if images:
+        db.session.execute(insert(Image), images)
+
+    # Aggregates for every day the batch touched, in the same transaction
+    recompute_days(db.session, {row['day'] for _, row in with_id + without_id})
+    return len(with_id) + len(without_id), len(batch) - len(with_id) - len(without_id), len(images)
+
+
+def import_lines(stream):
+    """Bulk-insert reflections from an NDJSON byte stream.
+
+    Lines are read one at a time and inserted IMPORT_BATCH per transaction
+    with executemany-style statements. On a bad line the pending batch is
+    dropped and InvalidImportLine is raised with the line number and the
+    counts committed so far; earlier batches stay committed. Returns counts
+    of inserted, skipped and image rows.
+    """
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream)
+
+    totals = {'imported': 0, 'skipped': 0, 'images': 0}
+    committed = dict(totals, last_line=0)
+
+    def flush(batch, last_line):
+        inserted, skipped, images = _insert_batch(batch)
+        db.session.commit()
+        totals['imported'] += inserted
+        totals['skipped'] += skipped
+        totals['images'] += images
+        committed.update(totals, last_line=last_line)
+        logger.debug("Imported batch of %d reflections", inserted)
+
+    batch = []
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            batch.append((record, _reflection_row(record)))
+        except (ValueError, TypeError) as e:
+            db.session.rollback()
+            raise InvalidImportLine(f'line {number}: {e}', line=number, committed=dict(committed)) from e
+        if len(batch) >= IMPORT_BATCH:
+            flush(batch, number)
+            batch = []
+    if batch:
+        flush(batch, number)
+
+    logger.info("Imported %d reflections (%d skipped, %d images)", totals['imported'], totals['skipped'], totals['images'])
+    return totals
@@ -1,117 +1,305 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+import numpy as np
 import requests
 from datetime import datetime, timedelta
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, writers aren't serialized across processes
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 # Create Blueprint
 weather_bp = Blueprint('weather', __name__, url_prefix='/api/weather')
 
+class ForecastCache:
+    """Raw Open-Meteo forecasts keyed by (lat, lon, hour bucket).
+
+    The hourly forecast only changes about once an hour, so one upstream
+    response per location per clock hour is kept and every "from now on"
+    view is derived from it. With ``path`` set, entries are also written to a
+    JSON file and reloaded on start, so a restart within the hour doesn't
+    refetch, and re-read on a miss, so worker processes pick up forecasts the
+    scheduler's leader fetched. Writers take an flock on ``<path>.lock``
+    around reload-and-write, so no process drops another's entries, and each
+    write goes through its own temporary file.
+    """
+
+    def __init__(self, path=None):
+        self.path = None
+        self._entries = {}
+        self._loaded_mtime = None
+        self._lock = threading.Lock()
+        if path:
+            self.use_path(path)
+
+    def use_path(self, path):
+        """Persist to ``path`` from now on, loading whatever is already stored there."""
+        with self._lock:
+            self.path = path
+            self._loaded_mtime = None
+            self._reload()
+
+    def _reload(self):
+        """Pick up entries another process wrote to ``path`` since the last read."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with open(self.path) as f:
+                loaded = {tuple(entry['key']): entry['data'] for entry in json.load(f)}
+            self._entries.update(loaded)
+            self._loaded_mtime = mtime
+            logger.debug("Loaded %d cached forecasts from %s", len(loaded), self.path)
+        except Exception as e:
+            logger.error("Error loading forecast cache: %s", e)
+
+    @staticmethod
+    def _key(lat, lon, now):
+        return (round(lat, 4), round(lon, 4), now.strftime('%Y-%m-%dT%H'))
+
+    def get(self, lat, lon, now):
+        key = self._key(lat, lon, now)
+        with self._lock:
+            if key not in self._entries and self.path:
+                self._reload()
+            return self._entries.get(key)
+
+    def put(self, lat, lon, now, data):
+        key = self._key(lat, lon, now)
+        with self._lock, self._file_lock():
+            if self.path:
+                self._reload()
+            # Buckets before the previous hour are never read again; later ones
+            # may have been prefetched ahead of the hour changing
+            oldest = self._key(lat, lon, now - timedelta(hours=1))[2]
+            self._entries = {k: v for k, v in self._entries.items() if k[2] >= oldest}
+            self._entries[key] = data
+            if self.path:
+                self._persist()
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold an exclusive flock on ``<path>.lock`` (a no-op without a path or fcntl)."""
+        if not self.path or fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _persist(self):
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.',
+                                            prefix=os.path.basename(self.path) + '.', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump([{'key': list(k), 'data': v} for k, v in self._entries.items()], f)
+            os.replace(tmp_path, self.path)
+            self._loaded_mtime = os.stat(self.path).st_mtime_ns
+        except Exception as e:
+            logger.error("Error saving forecast cache: %s", e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+# Shared by every WeatherClient. create_app() points it at WEATHER_CACHE_PATH,
+# or <instance>/weather_cache.json, so it persists and is shared by workers.
+forecast_cache = ForecastCache()
+
+# Manchester, UK coordinates
+DEFAULT_LOCATION = (53.4808, -2.2426)
+
+HOURLY_FIELDS = 'temperature_2m,apparent_temperature,precipitation_probability,weathercode,windspeed_10m'
+
+# WMO weather interpretation codes
+WEATHER_CODES = {
+    0: "Clear sky",
+    1: "Mainly clear",
+    2: "Partly cloudy",
+    3: "Overcast",
+    45: "Foggy",
+    48: "Depositing rime fog",
+    51: "Light drizzle",
+    53: "Moderate drizzle",
+    55: "Dense drizzle",
+    61: "Slight rain",
+    63: "Moderate rain",
+    65: "Heavy rain",
+    71: "Slight snow",
+    73: "Moderate snow",
+    75: "Heavy snow",
+    77: "Snow grains",
+    80: "Slight rain showers",
+    81: "Moderate rain showers",
+    82: "Violent rain showers",
+    85: "Slight snow showers",
+    86: "Heavy snow showers",
+    95: "Thunderstorm",
+    96: "Thunderstorm with slight hail",
+    99: "Thunderstorm with heavy hail"
+}
+
+# WEATHER_CODES as an array indexed by code, so a whole column maps in one step
+_CODE_DESCRIPTIONS = np.array(
+    [WEATHER_CODES.get(code, "Unknown") for code in range(max(WEATHER_CODES) + 2)],
+    dtype=object
+)
+_UNKNOWN_CODE = len(_CODE_DESCRIPTIONS) - 1
+
+# (connect, read) timeout in seconds for Open-Meteo, within the overview's
+# 4s weather deadline so a hung socket can't hold a fan-out worker forever
+REQUEST_TIMEOUT = (2, 4)
+
+# Upper bound on locations per /api/weather call (and per upstream request)
+MAX_LOCATIONS = 50
+
 class WeatherClient:
-    def __init__(self):
+    def __init__(self, lat=DEFAULT_LOCATION[0], lon=DEFAULT_LOCATION[1]):
         """Initialize the OpenMeteo client."""
         self.base_url = "https://api.open-meteo.com/v1"
-        # Manchester, UK coordinates
-        self.lat = 53.4808
-        self.lon = -2.2426
-        
+        self.lat = lat
+        self.lon = lon
+
+    def _fetch_forecasts(self, locations):
+        """Fetch raw forecasts for several locations in one Open-Meteo request."""
+        forecast_url = f"{self.base_url}/forecast"
+        params = {
+            'latitude': ','.join(str(lat) for lat, _ in locations),
+            'longitude': ','.join(str(lon) for _, lon in locations),
+            'current_weather': True,
+            'hourly': HOURLY_FIELDS,
+            # Hourly times in each location's own timezone
+            'timezone': 'auto',
+            'forecast_days': 2
+        }
+
+        response = requests.get(forecast_url, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        payload = response.json()
+        # A single location comes back as an object, several as a list in request order
+        if isinstance(payload, dict):
+            payload = [payload]
+        return [{
+            'current_weather': item['current_weather'],
+            'hourly': item['hourly'],
+            'utc_offset_seconds': item.get('utc_offset_seconds', 0)
+        } for item in payload]
+
+    def _get_forecasts(self, locations, now):
+        """Raw forecasts for ``locations``, fetched at most once per location per hour.
+
+        Locations missing from forecast_cache are fetched together in a single
+        upstream request.
+        """
+        forecasts = {location: forecast_cache.get(*location, now) for location in locations}
+        missing = [location for location, data in forecasts.items() if data is None]
+        for i in range(0, len(missing), MAX_LOCATIONS):
+            chunk = missing[i:i + MAX_LOCATIONS]
+            logger.debug("Fetching forecasts for %d locations", len(chunk))
+            for location, data in zip(chunk, self._fetch_forecasts(chunk)):
+                forecast_cache.put(*location, now, data)
+                forecasts[location] = data
+        return [forecasts[location] for location in locations]
+
     def get_weather(self):
-        """Get current weather and forecast for Manchester."""
+        """Get current weather and forecast for this client's location."""
         try:
-            # Get current weather and hourly forecast
-            forecast_url = f"{self.base_url}/forecast"
-            params = {
-                'latitude': self.lat,
-                'longitude': self.lon,
-                'current_weather': True,
-                'hourly': 'temperature_2m,apparent_temperature,precipitation_probability,weathercode,windspeed_10m',
-                'timezone': 'Europe/London',
-                'forecast_days': 2
-            }
-            
-            response = requests.get(forecast_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Process current weather
-            current = data['current_weather']
-            current_weather = {
-                'temp': round(current['temperature']),
-                'wind_speed': current['windspeed'],
-                'description': self._get_weather_description(current['weathercode'])
-            }
-            
-            # Process hourly forecasts
-            hourly = data['hourly']
-            today = datetime.now().date()
-            tomorrow = today + timedelta(days=1)
-            
-            today_forecasts = []
-            tomorrow_forecasts = []
-            
-            for i in range(len(hourly['time'])):
-                forecast_time = datetime.fromisoformat(hourly['time'][i])
-                forecast_date = forecast_time.date()
-                
-                if forecast_time < datetime.now():
-                    continue
-                    
-                forecast_info = {
-                    'time': forecast_time.strftime('%H:%M'),
-                    'temp': round(hourly['temperature_2m'][i]),
-                    'feels_like': round(hourly['apparent_temperature'][i]),
-                    'description': self._get_weather_description(hourly['weathercode'][i]),
-                    'wind_speed': hourly['windspeed_10m'][i],
-                    'precipitation_prob': hourly['precipitation_probability'][i]
-                }
-                
-                if forecast_date == today:
-                    today_forecasts.append(forecast_info)
-                elif forecast_date == tomorrow:
-                    tomorrow_forecasts.append(forecast_info)
-            
-            return {
-                'current': current_weather,
-                'today': today_forecasts,
-                'tomorrow': tomorrow_forecasts
-            }
-            
+            return self.get_weather_for([(self.lat, self.lon)])[0]
         except Exception as e:
-            logger.error(f"Error getting weather data: {str(e)}")
+            logger.error("Error getting weather data: %s", e)
             raise
-            
+
+    def get_weather_for(self, locations):
+        """Get current weather and forecast for each ``(lat, lon)`` in ``locations``, in order."""
+        forecasts = self._get_forecasts(list(locations), datetime.now())
+        return [self._build_weather(data) for data in forecasts]
+
+    def prefetch(self, locations, lead):
+        """Make sure forecasts for now and for ``lead`` from now are cached.
+
+        Run ahead of the hour changing, this fills the next hour's bucket
+        before any request needs it.
+        """
+        now = datetime.now()
+        self._get_forecasts(list(locations), now)
+        self._get_forecasts(list(locations), now + lead)
+
+    def _build_weather(self, data):
+        """Derive the current/today/tomorrow view from a raw forecast."""
+        # Local time at the forecast location, matching the hourly timestamps
+        now = datetime.utcnow() + timedelta(seconds=data.get('utc_offset_seconds', 0))
+
+        # Process current weather
+        current = data['current_weather']
+        current_weather = {
+            'temp': round(current['temperature']),
+            'wind_speed': current['windspeed'],
+            'description': self._get_weather_description(current['weathercode'])
+        }
+
+        # Process hourly forecasts as columns
+        hourly = data['hourly']
+        times = np.array(hourly['time'], dtype='datetime64[m]')
+        days = times.astype('datetime64[D]')
+        today = np.datetime64(now.date())
+        upcoming = times >= np.datetime64(now)
+
+        temps = self._round_column(hourly['temperature_2m'])
+        feels_like = self._round_column(hourly['apparent_temperature'])
+        descriptions = self._describe_codes(hourly['weathercode'])
+
+        def rows(mask):
+            return [{
+                'time': hourly['time'][i][11:16],
+                'temp': temps[i],
+                'feels_like': feels_like[i],
+                'description': descriptions[i],
+                'wind_speed': hourly['windspeed_10m'][i],
+                'precipitation_prob': hourly['precipitation_probability'][i]
+            } for i in np.flatnonzero(mask)]
+
+        today_forecasts = rows(upcoming & (days == today))
+        tomorrow_forecasts = rows(upcoming & (days == today + 1))
+
+        return {
+            'current': current_weather,
+            'today': today_forecasts,
+            'tomorrow': tomorrow_forecasts
+        }
+
+    @staticmethod
+    def _round_column(values):
+        """Round a column of readings to ints; Open-Meteo's nulls (common late in long forecasts) become None."""
+        values = np.asarray(values, dtype=float)
+        missing = np.isnan(values)
+        rounded = np.rint(np.where(missing, 0, values)).astype(int)
+        return [None if gap else int(value) for value, gap in zip(rounded, missing)]
+
+    @staticmethod
+    def _describe_codes(codes):
+        """Map a column of WMO codes to descriptions through the lookup table."""
+        codes = np.asarray(codes, dtype=float)
+        known = np.isfinite(codes) & (codes >= 0) & (codes < _UNKNOWN_CODE)
+        index = np.where(known, codes, _UNKNOWN_CODE).astype(int)
+        return _CODE_DESCRIPTIONS[index]
+
     def _get_weather_description(self, code):
         """Convert WMO Weather code to description."""
-        weather_codes = {
-            0: "Clear sky",
-            1: "Mainly clear",
-            2: "Partly cloudy",
-            3: "Overcast",
-            45: "Foggy",
-            48: "Depositing rime fog",
-            51: "Light drizzle",
-            53: "Moderate drizzle",
-            55: "Dense drizzle",
-            61: "Slight rain",
-            63: "Moderate rain",
-            65: "Heavy rain",
-            71: "Slight snow",
-            73: "Moderate snow",
-            75: "Heavy snow",
-            77: "Snow grains",
-            80: "Slight rain showers",
-            81: "Moderate rain showers",
-            82: "Violent rain showers",
-            85: "Slight snow showers",
-            86: "Heavy snow showers",
-            95: "Thunderstorm",
-            96: "Thunderstorm with slight hail",
-            99: "Thunderstorm with heavy hail"
-        }
-        return weather_codes.get(code, "Unknown")
+        return WEATHER_CODES.get(code, "Unknown")
 
 @weather_bp.route('/manchester', methods=['GET'])
 def get_manchester_weather():
@@ -126,8 +314,62 @@ def get_manchester_weather():
         })
         
     except Exception as e:
-        logger.error(f"Error in get_manchester_weather: {str(e)}")
+        logger.error("Error in get_manchester_weather: %s", e)
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
+def _parse_location(value):
+    """Parse a ``lat,lon`` query value into a float pair."""
+    try:
+        lat, lon = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError(f"Invalid location '{value}', expected 'lat,lon'")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"Location '{value}' is out of range")
+    return lat, lon
+
+def configured_locations():
+    """Locations to keep warm, from WEATHER_LOCATIONS (``lat,lon;lat,lon``), default Manchester."""
+    value = os.getenv('WEATHER_LOCATIONS')
+    if not value:
+        return [DEFAULT_LOCATION]
+    return [_parse_location(part) for part in value.split(';') if part.strip()]
+
+@weather_bp.route('', methods=['GET'])
+def get_weather():
+    """Get weather for several locations, e.g. ``?location=53.48,-2.24&location=51.51,-0.13``.
+
+    Locations not already cached are fetched together in one upstream
+    request. Defaults to Manchester when no location is given.
+    """
+    try:
+        values = request.args.getlist('location')
+        locations = [_parse_location(value) for value in values] or [DEFAULT_LOCATION]
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    if len(locations) > MAX_LOCATIONS:
+        return jsonify({
+            'status': 'error',
+            'message': f'At most {MAX_LOCATIONS} locations per request'
+        }), 400
+
+    try:
+        results = WeatherClient().get_weather_for(locations)
+        return jsonify({
+            'status': 'success',
+            'data': [{
+                'latitude': lat,
+                'longitude': lon,
+                **weather
+            } for (lat, lon), weather in zip(locations, results)]
+        })
+
+    except Exception as e:
+        logger.error("Error in get_weather: %s", e)
         return jsonify({
             'status': 'error',
             'message': str(e)
-        }), 500 
\ No newline at end of file
+        }), 500
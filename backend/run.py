@@ -1,6 +1,10 @@
+import os
 from app import create_app
 
-app = create_app()
-
 if __name__ == '__main__':
+    # Created here rather than at import time: image resizing workers are
+    # spawned processes that re-import this module as __mp_main__.
+    # FLASK_DEBUG tells create_app this is a debug (reloader) run
+    os.environ['FLASK_DEBUG'] = '1'
+    app = create_app()
     app.run(host='0.0.0.0', port=5011, debug=True)
\ No newline at end of file